@@ -0,0 +1,128 @@
+"""Fake YouTrack HTTP server with configurable latency, errors and volume.
+
+Serves the ``FakeYouTrack`` payloads over HTTP, e.g. to point a development
+Sentry at it::
+
+    python benchmarks/fake_server.py --port 8111 --volume extreme \\
+        --latency 50 --jitter 20 --error-rate 0.01
+"""
+import argparse
+import random
+import threading
+import time
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+
+from fake_youtrack import VOLUMES, FakeYouTrack
+import payloads  # noqa
+
+
+class FakeYouTrackHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    # send headers and body in one segment, otherwise delayed ACKs dominate
+    # the latency of keep-alive connections
+    wbufsize = -1
+
+    def do_GET(self):
+        self.respond()
+
+    def do_POST(self):
+        self.respond()
+
+    def respond(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else None
+        delay = server.latency + random.uniform(0, server.jitter)
+        if delay:
+            time.sleep(delay)
+
+        if random.random() < server.error_rate:
+            status, headers = 503, {'Content-Type': 'application/xml'}
+            content = payloads.error('Service Unavailable')
+        elif random.random() < server.hang_rate:
+            # longer than any sensible read timeout of the client
+            time.sleep(server.hang_time)
+            return
+        else:
+            url = server.youtrack.url + self.path
+            status, headers, content = server.youtrack.handle(
+                self.command, url, body)
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeYouTrackServer(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, address, volume='realistic', latency=0, jitter=0,
+                 error_rate=0, hang_rate=0, hang_time=60):
+        HTTPServer.__init__(self, address, FakeYouTrackHandler)
+        self.url = 'http://%s:%s' % self.server_address
+        self.youtrack = FakeYouTrack(self.url, volume)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang_time = hang_time
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self.url
+
+
+def add_server_arguments(parser):
+    parser.add_argument('--volume', default='realistic',
+                        choices=sorted(VOLUMES))
+    parser.add_argument('--latency', type=float, default=0,
+                        help="response latency in milliseconds")
+    parser.add_argument('--jitter', type=float, default=0,
+                        help="random latency added to each response, in "
+                             "milliseconds")
+    parser.add_argument('--error-rate', type=float, default=0,
+                        help="fraction of requests answered with 503")
+    parser.add_argument('--hang-rate', type=float, default=0,
+                        help="fraction of requests never answered")
+
+
+def create_server(args, host='127.0.0.1', port=0):
+    return FakeYouTrackServer(
+        (host, port), args.volume, args.latency / 1000.0,
+        args.jitter / 1000.0, args.error_rate, args.hang_rate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8111)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = create_server(args, args.host, args.port)
+    print('Fake YouTrack listening on %s (login with any username and '
+          'password)' % server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
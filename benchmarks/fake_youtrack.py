@@ -0,0 +1,229 @@
+"""In-process fake of the YouTrack REST API used by ``YouTrackClient``.
+
+``FakeYouTrack`` answers requests with synthetic payloads of a given volume
+and counts them per endpoint. ``FakeTransport`` plugs it into the shared
+session of an instance, so the benchmarks run without any network::
+
+    youtrack = FakeYouTrack(URL, 'extreme')
+    FakeTransport.mount(youtrack)
+    client = YouTrackClient(URL, api_key='benchmark')
+"""
+import os
+import re
+import sys
+import threading
+from collections import Counter
+
+from requests import Response
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+try:
+    from urllib import unquote
+    from urlparse import parse_qsl, urlsplit
+except ImportError:
+    from urllib.parse import parse_qsl, unquote, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import payloads  # noqa
+from sentry_youtrack.youtrack import (ENDPOINTS, YouTrackClient,  # noqa
+                                      get_session)
+
+
+VOLUMES = {
+    'realistic': {
+        'users': 300, 'groups': 5, 'group_size': 100, 'versions': 50,
+        'values': 10, 'issues': 500, 'projects': 20},
+    'extreme': {
+        'users': 5000, 'groups': 20, 'group_size': 1000, 'versions': 1000,
+        'values': 200, 'issues': 10000, 'projects': 500},
+}
+
+PROJECT_ID = 'myproject'
+
+# name, type and bundle of the project fields
+FIELDS = [
+    ('Priority', 'enum[1]', 'Priorities'),
+    ('Type', 'enum[1]', 'Types'),
+    ('State', 'state[1]', 'States'),
+    ('Assignee', 'user[1]', 'myproject: Assignees'),
+    ('Subsystem', 'ownedField[1]', 'myproject: Subsystems'),
+    ('Fix versions', 'version[*]', 'myproject: Versions'),
+    ('Affected versions', 'version[*]', 'myproject: Versions'),
+    ('Fixed in build', 'build[1]', 'myproject: Builds'),
+    ('Estimation', 'integer', None),
+]
+
+
+class FakeYouTrack(object):
+
+    def __init__(self, url, volume='realistic'):
+        self.url = url.rstrip('/')
+        self.volume = dict(VOLUMES[volume]) if volume in VOLUMES else volume
+        self.requests = Counter()
+        self.issues_created = 0
+        self._lock = threading.Lock()
+        self._bodies = {}
+        self.routes = [
+            ('POST', r'^/rest/user/login$', self.login),
+            ('GET', r'^/rest/admin/project/[^/]+/customfield$',
+             self.project_field_refs),
+            ('GET', r'^/rest/admin/project/[^/]+/customfield/(.+)$',
+             self.project_field),
+            ('GET', r'^/rest/admin/project/([^/]+)$', self.project),
+            ('GET', r'^/rest/project/all$', self.projects),
+            ('GET', r'^/rest/admin/customfield/(\w+)/(.+)$', self.bundle),
+            ('GET', r'^/rest/admin/user$', self.group_users),
+            ('GET', r'^/rest/admin/user/(.+)$', self.user),
+            ('GET', r'^/rest/issue/byproject/[^/]+$', self.issues),
+            ('POST', r'^/rest/issue$', self.create_issue),
+            ('POST', r'^/rest/issue/[^/]+/execute$', self.execute),
+        ]
+        self.routes = [(method, re.compile(pattern), handler)
+                       for method, pattern, handler in self.routes]
+
+    def reset(self):
+        with self._lock:
+            self.requests.clear()
+
+    def count(self, path):
+        for name, pattern in ENDPOINTS:
+            if pattern.match(path):
+                break
+        else:
+            name = 'other'
+        with self._lock:
+            self.requests[name] += 1
+
+    def _memoize(self, key, build):
+        body = self._bodies.get(key)
+        if body is None:
+            body = self._bodies[key] = build()
+        return body
+
+    def handle(self, method, url, body=None):
+        """Returns the status, headers and body of the response."""
+        parts = urlsplit(url)
+        path = unquote(parts.path)
+        prefix = urlsplit(self.url).path
+        if path.startswith(prefix):
+            path = path[len(prefix):]
+        params = dict(parse_qsl(parts.query))
+        self.count(path)
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(path)
+            if route_method == method and match:
+                return handler(params, *match.groups())
+        return 404, {}, payloads.error('Not found: %s %s' % (method, path))
+
+    def _ok(self, body):
+        return 200, {'Content-Type': 'application/xml'}, body
+
+    def login(self, params):
+        headers = {
+            'Content-Type': 'application/xml',
+            'Set-Cookie': '%s=benchmark; Path=/' % (
+                YouTrackClient.API_KEY_COOKIE_NAME,)}
+        return 200, headers, payloads.XML_HEADER + b'<login>ok</login>'
+
+    def project_field_refs(self, params):
+        return self._ok(self._memoize('refs', lambda: (
+            payloads.project_field_refs(
+                self.url, PROJECT_ID, [field[0] for field in FIELDS]))))
+
+    def project_field(self, params, name):
+        for field_name, field_type, bundle in FIELDS:
+            if field_name == name:
+                return self._ok(payloads.project_field(
+                    field_name, field_type, bundle))
+        return 404, {}, payloads.error('Field not found: %s' % name)
+
+    def project(self, params, project_id):
+        return self._ok(payloads.project(project_id, 'Project %s' % project_id))
+
+    def projects(self, params):
+        return self._ok(self._memoize('projects', lambda: (
+            payloads.projects(self.volume['projects']))))
+
+    def bundle(self, params, bundle_type, name):
+        volume = self.volume
+        builders = {
+            'bundle': lambda: payloads.enumeration(volume['values'], name),
+            'stateBundle': lambda: payloads.states(10, name),
+            'userBundle': lambda: payloads.user_bundle(
+                volume['users'], volume['groups'], name),
+            'ownedFieldBundle': lambda: payloads.owned_fields(
+                volume['values'], name),
+            'versionBundle': lambda: payloads.versions(
+                volume['versions'], name),
+            'buildBundle': lambda: payloads.builds(volume['versions'], name),
+        }
+        if bundle_type not in builders:
+            return 404, {}, payloads.error('Bundle not found: %s' % name)
+        return self._ok(self._memoize(
+            ('bundle', bundle_type, name), builders[bundle_type]))
+
+    def group_users(self, params):
+        group = params.get('group', '')
+        index = int(re.sub(r'\D', '', group) or 0)
+        size = self.volume['group_size']
+        return self._ok(self._memoize(('group', group), lambda: (
+            payloads.user_refs(size, offset=index * size))))
+
+    def user(self, params, login):
+        return self._ok(payloads.user(login))
+
+    def issues(self, params):
+        offset = int(params.get('after') or 0)
+        limit = int(params.get('max') or 10)
+        count = max(0, min(limit, self.volume['issues'] - offset))
+        return self._ok(self._memoize(('issues', offset, count), lambda: (
+            payloads.issues(count, PROJECT_ID, offset))))
+
+    def create_issue(self, params):
+        with self._lock:
+            self.issues_created += 1
+            number = self.volume['issues'] + self.issues_created
+        issue_id = '%s-%d' % (PROJECT_ID, number)
+        headers = {'Content-Type': 'application/xml',
+                   'Location': '%s/rest/issue/%s' % (self.url, issue_id)}
+        return 201, headers, payloads.issue(issue_id)
+
+    def execute(self, params):
+        return 200, {}, b''
+
+
+class FakeTransport(BaseAdapter):
+    """Transport adapter which answers requests with ``FakeYouTrack``."""
+
+    def __init__(self, youtrack):
+        super(FakeTransport, self).__init__()
+        self.youtrack = youtrack
+
+    @classmethod
+    def mount(cls, youtrack):
+        """Mounts the fake on the shared session of the instance."""
+        adapter = cls(youtrack)
+        get_session(youtrack.url).mount(youtrack.url, adapter)
+        return adapter
+
+    def send(self, request, **kwargs):
+        status, headers, body = self.youtrack.handle(
+            request.method, request.url, request.body)
+        response = Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(headers)
+        response._content = body
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        cookie = headers.get('Set-Cookie')
+        if cookie:
+            name, value = cookie.split(';')[0].split('=', 1)
+            response.cookies.set(name, value)
+        return response
+
+    def close(self):
+        pass
@@ -0,0 +1,143 @@
+"""Simulates many concurrent Sentry users working with a fake YouTrack.
+
+Every user repeatedly opens the new issue form (fetches the project fields),
+searches issues or creates an issue, like the plugin does in a web request.
+Reports throughput and latency percentiles of each action::
+
+    python benchmarks/load.py --users 50 --duration 30 --latency 20 \\
+        --error-rate 0.01 --volume extreme
+"""
+import argparse
+import random
+import threading
+import time
+from collections import defaultdict
+
+from fake_server import add_server_arguments, create_server
+from fake_youtrack import PROJECT_ID
+from sentry_youtrack.youtrack import (YouTrackClient, close_sessions,
+                                      conditional_cache, group_cache)
+
+
+def open_form(client):
+    list(client.get_project_fields(PROJECT_ID))
+
+
+def search_issues(client):
+    query = random.choice(['', 'worker', '%s-1' % PROJECT_ID])
+    client.get_project_issues(PROJECT_ID, query=query, limit=16)
+
+
+def create_issue(client):
+    issue_id = client.create_issue({
+        'project': PROJECT_ID,
+        'summary': 'Exception in worker',
+        'description': 'Something went wrong'})
+    client.execute_commands(issue_id, ['Priority Value 1', 'add tag sentry'])
+
+
+# action and its weight in the mix
+ACTIONS = [(open_form, 3), (search_issues, 6), (create_issue, 1)]
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100.0))]
+
+
+def choose_action():
+    total = sum(weight for action, weight in ACTIONS)
+    point = random.uniform(0, total)
+    for action, weight in ACTIONS:
+        point -= weight
+        if point <= 0:
+            return action
+    return ACTIONS[-1][0]
+
+
+def run(url, users, duration, client_kwargs, cold):
+    timings = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.time() + duration
+
+    def user():
+        while time.time() < deadline:
+            action = choose_action()
+            if cold:
+                conditional_cache.clear()
+                group_cache.clear()
+            start = time.time()
+            try:
+                # the plugin creates a client for every web request
+                client = YouTrackClient(url, username='root',
+                                        password='admin', **client_kwargs)
+                action(client)
+            except Exception as e:
+                with lock:
+                    errors[(action.__name__, type(e).__name__)] += 1
+                continue
+            with lock:
+                timings[action.__name__].append(time.time() - start)
+
+    threads = [threading.Thread(target=user) for _ in range(users)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return timings, errors, time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=10,
+                        help="seconds")
+    parser.add_argument('--url', help="YouTrack to test instead of the "
+                                      "built-in fake server")
+    parser.add_argument('--pool-size', type=int, default=10)
+    parser.add_argument('--max-workers', type=int, default=4)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--retries', type=int, default=0)
+    parser.add_argument('--cold', action='store_true',
+                        help="clear the client caches before every action")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        server = create_server(args)
+        url = server.start()
+    client_kwargs = {
+        'pool_size': args.pool_size,
+        'max_workers': args.max_workers,
+        'timeout': args.timeout,
+        'retries': args.retries,
+        'retry_backoff': 0.05}
+
+    timings, errors, total = run(url, args.users, args.duration,
+                                 client_kwargs, args.cold)
+    close_sessions()
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+    print('%-14s %7s %9s %9s %9s %9s' % (
+        'action', 'count', 'ops/s', 'p50 [ms]', 'p95 [ms]', 'p99 [ms]'))
+    for name in sorted(timings):
+        values = timings[name]
+        print('%-14s %7d %9.1f %9.1f %9.1f %9.1f' % (
+            name, len(values), len(values) / total,
+            percentile(values, 50) * 1000, percentile(values, 95) * 1000,
+            percentile(values, 99) * 1000))
+    count = sum(len(values) for values in timings.values())
+    print('\n%d actions in %.1f s: %.1f actions/s' % (
+        count, total, count / total))
+    for (name, error), count in sorted(errors.items()):
+        print('%s failed %d times with %s' % (name, count, error))
+
+
+if __name__ == '__main__':
+    main()
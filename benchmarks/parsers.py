@@ -0,0 +1,51 @@
+"""Compares the BeautifulSoup and the incremental XML parser backends.
+
+    python benchmarks/parsers.py --repeat 5
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import payloads  # noqa
+from sentry_youtrack.parsers import IterParser, SoupParser  # noqa
+
+
+CASES = [
+    ('user bundle (5000 users)', 'get_user_bundle',
+     (payloads.user_bundle(5000, groups=10),)),
+    ('versions (500)', 'get_bundle_values',
+     (payloads.versions(500), 'versions')),
+    ('issues (2000)', 'get_issues', (payloads.issues(2000),)),
+    ('projects (500)', 'get_projects', (payloads.projects(500),)),
+]
+
+
+def measure(parser, method, args, repeat):
+    def run():
+        result = getattr(parser, method)(*args)
+        if not isinstance(result, (list, tuple)):
+            list(result)
+    return min(timeit.repeat(run, number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    soup, iterparser = SoupParser(), IterParser()
+    print('%-26s %10s %12s %8s' % ('payload', 'soup [ms]', 'iter [ms]', 'x'))
+    for name, method, method_args in CASES:
+        assert (list(getattr(soup, method)(*method_args)) ==
+                list(getattr(iterparser, method)(*method_args)))
+        soup_time = measure(soup, method, method_args, args.repeat)
+        iter_time = measure(iterparser, method, method_args, args.repeat)
+        print('%-26s %10.2f %12.2f %8.1f' % (
+            name, soup_time * 1000, iter_time * 1000, soup_time / iter_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Synthetic YouTrack XML responses for the benchmarks."""
+
+XML_HEADER = b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+
+
+def user_bundle(users=1000, groups=0, name='Assignees'):
+    items = [b'<user login="user%d" url="http://localhost/rest/admin/user/'
+             b'user%d"/>' % (i, i) for i in range(users)]
+    items.extend(b'<userGroup name="group%d"/>' % i for i in range(groups))
+    return (XML_HEADER + b'<userBundle name="' + name.encode('utf-8') +
+            b'">' + b''.join(items) + b'</userBundle>')
+
+
+def user_refs(users=1000, offset=0):
+    items = [b'<user login="user%d" url="http://localhost/rest/admin/user/'
+             b'user%d"/>' % (i, i) for i in range(offset, offset + users)]
+    return XML_HEADER + b'<userRefs>' + b''.join(items) + b'</userRefs>'
+
+
+def versions(count=300, name='Versions'):
+    items = [b'<version description="Release %d" archived="false" '
+             b'released="true">%d.%d.%d</version>' % (i, i // 100, i // 10 % 10,
+                                                     i % 10)
+             for i in range(count)]
+    return (XML_HEADER + b'<versions name="' + name.encode('utf-8') +
+            b'">' + b''.join(items) + b'</versions>')
+
+
+def enumeration(count=10, name='Priorities'):
+    items = [b'<value colorIndex="%d">Value %d</value>' % (i % 20, i)
+             for i in range(count)]
+    return (XML_HEADER + b'<enumeration name="' + name.encode('utf-8') +
+            b'">' + b''.join(items) + b'</enumeration>')
+
+
+def issues(count=1000, project='myproject', offset=0):
+    items = [b'<issue id="%s-%d"><field name="projectShortName"><value>%s'
+             b'</value></field><field name="summary"><value>Exception in '
+             b'worker %d: something went wrong</value></field><field '
+             b'name="State"><value>Open</value></field><field '
+             b'name="updated"><value>1476000000000</value></field></issue>' % (
+                 project.encode('utf-8'), i, project.encode('utf-8'), i)
+             for i in range(offset + 1, offset + count + 1)]
+    return XML_HEADER + b'<issues>' + b''.join(items) + b'</issues>'
+
+
+def projects(count=100):
+    items = [b'<project name="Project %d" shortName="project%d"/>' % (i, i)
+             for i in range(count)]
+    return XML_HEADER + b'<projects>' + b''.join(items) + b'</projects>'
+
+
+def states(count=10, name='States'):
+    items = [b'<state isResolved="%s">State %d</state>' % (
+        b'true' if i >= count // 2 else b'false', i) for i in range(count)]
+    return (XML_HEADER + b'<stateBundle name="' + name.encode('utf-8') +
+            b'">' + b''.join(items) + b'</stateBundle>')
+
+
+def owned_fields(count=20, name='Subsystems'):
+    items = [b'<ownedField owner="user%d">Subsystem %d</ownedField>' % (i, i)
+             for i in range(count)]
+    return (XML_HEADER + b'<ownedFieldBundle name="' + name.encode('utf-8') +
+            b'">' + b''.join(items) + b'</ownedFieldBundle>')
+
+
+def builds(count=100, name='Builds'):
+    items = [b'<build assembleDate="1476000000000">%d</build>' % i
+             for i in range(count)]
+    return (XML_HEADER + b'<buildBundle name="' + name.encode('utf-8') +
+            b'">' + b''.join(items) + b'</buildBundle>')
+
+
+def project_field_refs(url, project, names):
+    items = [b'<projectCustomField name="%s" url="%s/rest/admin/project/%s/'
+             b'customfield/%s"/>' % (name.encode('utf-8'), url.encode('utf-8'),
+                                     project.encode('utf-8'),
+                                     name.replace(' ', '%20').encode('utf-8'))
+             for name in names]
+    return (XML_HEADER + b'<projectCustomFieldRefs>' + b''.join(items) +
+            b'</projectCustomFieldRefs>')
+
+
+def project_field(name, field_type, bundle=None):
+    param = b''
+    if bundle:
+        param = b'<param name="bundle" value="%s"/>' % bundle.encode('utf-8')
+    return (XML_HEADER + b'<projectCustomField name="%s" type="%s" '
+            b'emptyText="No %s" canBeEmpty="true">%s</projectCustomField>' % (
+                name.encode('utf-8'), field_type.encode('utf-8'),
+                name.encode('utf-8'), param))
+
+
+def project(project_id='myproject', name='My project'):
+    return (XML_HEADER + b'<project id="%s" name="%s" lead="root"/>' % (
+        project_id.encode('utf-8'), name.encode('utf-8')))
+
+
+def user(login):
+    return (XML_HEADER + b'<user login="%s" email="%s@example.com" '
+            b'fullName="%s"/>' % ((login.encode('utf-8'),) * 3))
+
+
+def issue(issue_id):
+    return XML_HEADER + b'<issue id="%s"/>' % issue_id.encode('utf-8')
+
+
+def error(message):
+    return XML_HEADER + b'<error>' + message.encode('utf-8') + b'</error>'
@@ -0,0 +1,125 @@
+"""Compares a new session per request with the pooled keep-alive sessions.
+
+Runs a local stub server, calls ``YouTrackClient.get_projects`` against it in
+both modes and prints the number of TCP connections (i.e. handshakes) the
+server accepted and the request latency::
+
+    python benchmarks/session_pool.py --requests 200 --threads 4
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sentry_youtrack.youtrack import YouTrackClient, close_sessions  # noqa
+
+
+PROJECTS = (b'<?xml version="1.0" encoding="UTF-8"?><projects>'
+            b'<project shortName="myproject" name="My project"/></projects>')
+
+
+class StubHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    # send headers and body in one segment, otherwise delayed ACKs dominate
+    # the latency of keep-alive connections
+    wbufsize = -1
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        with self.lock:
+            StubHandler.connections += 1
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/xml')
+        self.send_header('Content-Length', str(len(PROJECTS)))
+        self.end_headers()
+        self.wfile.write(PROJECTS)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100.0))]
+
+
+def run(url, requests, threads, per_call_session):
+    timings = []
+    lock = threading.Lock()
+
+    def worker(count):
+        client = YouTrackClient(url, api_key='benchmark')
+        for _ in range(count):
+            if per_call_session:
+                # behaves like the old client, which created a new
+                # session (and connection) for every call
+                close_sessions()
+                client = YouTrackClient(url, api_key='benchmark')
+            start = time.time()
+            list(client.get_projects())
+            with lock:
+                timings.append(time.time() - start)
+
+    StubHandler.connections = 0
+    workers = [threading.Thread(target=worker, args=(requests // threads,))
+               for _ in range(threads)]
+    start = time.time()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    total = time.time() - start
+    close_sessions()
+    return {
+        'connections': StubHandler.connections,
+        'requests': len(timings),
+        'total': total,
+        'mean': sum(timings) / len(timings),
+        'p95': percentile(timings, 95)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    server = StubServer(('127.0.0.1', 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    url = 'http://127.0.0.1:%s' % server.server_address[1]
+
+    print('%-22s %12s %9s %10s %10s' % (
+        'mode', 'connections', 'requests', 'mean [ms]', 'p95 [ms]'))
+    for name, per_call_session in (('session per request', True),
+                                   ('pooled session', False)):
+        result = run(url, args.requests, args.threads, per_call_session)
+        print('%-22s %12d %9d %10.2f %10.2f' % (
+            name, result['connections'], result['requests'],
+            result['mean'] * 1000, result['p95'] * 1000))
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
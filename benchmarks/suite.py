@@ -0,0 +1,135 @@
+"""Offline benchmarks of parsing, field fetching and form construction.
+
+Runs every operation against ``FakeYouTrack`` payloads of the given volume,
+prints its timings and the number of HTTP requests it makes, and saves the
+results as JSON so they can be compared between versions::
+
+    python benchmarks/suite.py --volume extreme
+    python benchmarks/suite.py --volume extreme --compare \\
+        benchmarks/results/0.4.0-extreme.json
+"""
+import argparse
+import json
+import os
+import platform
+import timeit
+
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure()
+
+from fake_youtrack import PROJECT_ID, FakeTransport, FakeYouTrack  # noqa
+import payloads  # noqa
+from sentry_youtrack import VERSION  # noqa
+from sentry_youtrack.forms import YouTrackProjectForm  # noqa
+from sentry_youtrack.youtrack import (YouTrackClient,  # noqa
+                                      conditional_cache, group_cache)
+
+
+URL = 'http://youtrack.benchmark'
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+def get_operations(client, youtrack):
+    volume = youtrack.volume
+    user_bundle = payloads.user_bundle(volume['users'], volume['groups'])
+    versions = payloads.versions(volume['versions'])
+    fields = list(client.get_project_fields(PROJECT_ID))
+
+    def get_project_fields():
+        # every run fetches the fields from YouTrack
+        conditional_cache.clear()
+        group_cache.clear()
+        list(client.get_project_fields(PROJECT_ID))
+
+    def create_issue():
+        issue_id = client.create_issue({
+            'project': PROJECT_ID,
+            'summary': 'Exception in worker',
+            'description': 'Something went wrong'})
+        client.execute_commands(issue_id, [
+            'Priority Value 1', 'Fix versions 0.0.1', 'add tag sentry'])
+
+    return [
+        ('_get_bundle (userBundle)',
+         lambda: client._get_bundle(user_bundle, 'userBundle')),
+        ('_get_bundle (versions)',
+         lambda: client._get_bundle(versions, 'versions')),
+        ('get_project_fields', get_project_fields),
+        ('get_project_issues', lambda: client.get_project_issues(
+            PROJECT_ID, limit=volume['issues'])),
+        ('iter_project_issues', lambda: list(client.iter_project_issues(
+            PROJECT_ID, page_size=500))),
+        ('add_project_fields',
+         lambda: YouTrackProjectForm().add_project_fields(fields)),
+        ('create_issue', create_issue),
+    ]
+
+
+def run(volume, repeat):
+    youtrack = FakeYouTrack(URL, volume)
+    FakeTransport.mount(youtrack)
+    client = YouTrackClient(URL, api_key='benchmark')
+    results = {}
+    for name, operation in get_operations(client, youtrack):
+        youtrack.reset()
+        operation()
+        requests = sum(youtrack.requests.values())
+        timings = sorted(timeit.repeat(operation, number=1, repeat=repeat))
+        results[name] = {
+            'min': timings[0],
+            'median': timings[len(timings) // 2],
+            'requests': requests}
+    return results
+
+
+def compare(results, previous):
+    print('\n%-28s %12s %12s %8s' % (
+        'operation', 'before [ms]', 'after [ms]', 'x'))
+    for name, result in sorted(results.items()):
+        if name not in previous['results']:
+            continue
+        before = previous['results'][name]['median']
+        after = result['median']
+        print('%-28s %12.2f %12.2f %8.2f' % (
+            name, before * 1000, after * 1000, before / after))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--volume', default='realistic',
+                        choices=['realistic', 'extreme'])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--label', default=VERSION,
+                        help="name of the results file, the version by "
+                             "default")
+    parser.add_argument('--compare', metavar='RESULTS',
+                        help="results of a previous run to compare with")
+    args = parser.parse_args()
+
+    results = run(args.volume, args.repeat)
+    print('%-28s %10s %12s %9s' % (
+        'operation', 'min [ms]', 'median [ms]', 'requests'))
+    for name, result in sorted(results.items()):
+        print('%-28s %10.2f %12.2f %9d' % (
+            name, result['min'] * 1000, result['median'] * 1000,
+            result['requests']))
+
+    if not os.path.isdir(RESULTS_DIR):
+        os.makedirs(RESULTS_DIR)
+    path = os.path.join(RESULTS_DIR, '%s-%s.json' % (args.label, args.volume))
+    with open(path, 'w') as f:
+        json.dump({'version': VERSION, 'label': args.label,
+                   'volume': args.volume, 'repeat': args.repeat,
+                   'python': platform.python_version(),
+                   'results': results}, f, indent=2, sort_keys=True)
+    print('\nSaved to %s' % path)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
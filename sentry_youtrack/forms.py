@@ -1,22 +1,85 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
 from hashlib import md5
+from multiprocessing.pool import ThreadPool
 
 from django import forms
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.utils.encoding import force_text
 from django.utils.translation import ugettext_lazy as _
-from requests.exceptions import ConnectionError, HTTPError, SSLError
+from requests.exceptions import ConnectionError, HTTPError, SSLError, Timeout
 from unidecode import unidecode
 
-from .youtrack import YouTrackClient
+from .youtrack import CircuitOpenError, TimedCache, YouTrackClient
 
 
 VERIFY_SSL_CERTIFICATE = getattr(
     settings, 'YOUTRACK_VERIFY_SSL_CERTIFICATE', True)
+CONNECTION_POOL_SIZE = getattr(settings, 'YOUTRACK_CONNECTION_POOL_SIZE', 10)
+TIMEOUT = getattr(settings, 'YOUTRACK_TIMEOUT', (5, 30))
+RETRIES = getattr(settings, 'YOUTRACK_RETRIES', 2)
+RETRY_BACKOFF = getattr(settings, 'YOUTRACK_RETRY_BACKOFF', 0.5)
+CIRCUIT_BREAKER_THRESHOLD = getattr(
+    settings, 'YOUTRACK_CIRCUIT_BREAKER_THRESHOLD', 5)
+CIRCUIT_BREAKER_TIMEOUT = getattr(
+    settings, 'YOUTRACK_CIRCUIT_BREAKER_TIMEOUT', 30)
+MAX_WORKERS = getattr(settings, 'YOUTRACK_MAX_WORKERS', 4)
+FIELDS_CACHE_TIMEOUT = getattr(settings, 'YOUTRACK_FIELDS_CACHE_TIMEOUT', 600)
+GROUP_CACHE_TIMEOUT = getattr(settings, 'YOUTRACK_GROUP_CACHE_TIMEOUT', 300)
+PROJECTS_CACHE_TIMEOUT = getattr(
+    settings, 'YOUTRACK_PROJECTS_CACHE_TIMEOUT', 60)
+# fields with more values are searched instead of listing all of them
+CHOICES_LIMIT = getattr(settings, 'YOUTRACK_CHOICES_LIMIT', 100)
+
+# projects and validated users per instance and credentials, so the
+# configuration page doesn't fetch them on every render
+project_cache = TimedCache()
+validated_users = TimedCache()
+
+
+class RemoteChoiceField(forms.CharField):
+    """Choice field whose values are searched with ``field_values_view``.
+
+    The form only contains the selected values, separated by commas when
+    there can be many of them.
+    """
+
+    default_error_messages = {
+        'invalid_choice': _('Select a valid choice. %(value)s is not one of '
+                            'the available choices.')}
+
+    def __init__(self, values, multiple=False, *args, **kwargs):
+        super(RemoteChoiceField, self).__init__(*args, **kwargs)
+        self.values = frozenset(values)
+        self.multiple = multiple
+
+    def to_python(self, value):
+        value = super(RemoteChoiceField, self).to_python(value)
+        if self.multiple:
+            return [item for item in value.split(',') if item]
+        return value
+
+    def validate(self, value):
+        super(RemoteChoiceField, self).validate(value)
+        for item in (value if self.multiple else [value]):
+            if item and item not in self.values:
+                raise ValidationError(
+                    self.error_messages['invalid_choice'],
+                    code='invalid_choice', params={'value': item})
+
+
+def get_field_key(field_name):
+    """Returns the key of the field's value in the default fields."""
+    return md5(unidecode(field_name)).hexdigest()
 
 
 class YouTrackProjectForm(forms.Form):
 
     PROJECT_FIELD_PREFIX = 'field_'
+    SCHEMA_CACHE_SIZE = 100
 
     FIELD_TYPE_MAPPING = {
         'float': forms.FloatField,
@@ -24,26 +87,78 @@ class YouTrackProjectForm(forms.Form):
         'date': forms.DateField,
         'string': forms.CharField,}
 
-    project_field_names = {}
+    # form fields compiled from the project fields, by class and schema
+    _schemas = OrderedDict()
+    _schemas_lock = threading.Lock()
 
     def __init__(self, project_fields=None, *args, **kwargs):
         super(YouTrackProjectForm, self).__init__(*args, **kwargs)
+        self.project_field_names = {}
         if project_fields is not None:
             self.add_project_fields(project_fields)
 
-    def add_project_fields(self, project_fields):
-        fields = []
+    @classmethod
+    def get_schema(cls, project_fields):
+        """Returns the form fields built from the project fields.
+
+        The fields are built once per distinct list of project fields and
+        shared by all forms, which only copy them.
+        """
+        # tuples are much faster to hash than serialized fields, and the
+        # key only has to be stable within the process
+        key = (cls, tuple(
+            (field['name'], field['type'],
+             tuple(field['values']) if field['values'] else None)
+            for field in project_fields))
+        with cls._schemas_lock:
+            schema = cls._schemas.pop(key, None)
+            if schema is not None:
+                cls._schemas[key] = schema
+                return schema
+        schema = cls._compile(project_fields)
+        with cls._schemas_lock:
+            cls._schemas[key] = schema
+            while len(cls._schemas) > cls.SCHEMA_CACHE_SIZE:
+                cls._schemas.popitem(last=False)
+        return schema
+
+    @classmethod
+    def _compile(cls, project_fields):
+        schema = []
         for field in project_fields:
-            form_field = self._get_form_field(field)
+            form_field = cls._get_form_field(field)
             if form_field:
                 form_field.widget.attrs = {
                     'class': 'project-field',
                     'data-field': field['name']}
-                index = len(fields) + 1
-                field_name = '%s%s' % (self.PROJECT_FIELD_PREFIX, index)
-                self.fields[field_name] = form_field
-                fields.append(form_field)
-                self.project_field_names[field_name] = field['name']
+                if isinstance(form_field, RemoteChoiceField):
+                    form_field.widget.attrs.update({
+                        'class': 'project-field remote-choice',
+                        'data-multiple': int(form_field.multiple)})
+                field_name = '%s%s' % (cls.PROJECT_FIELD_PREFIX,
+                                       len(schema) + 1)
+                schema.append((field_name, field['name'],
+                               get_field_key(field['name']), form_field))
+        return schema
+
+    def add_project_fields(self, project_fields):
+        default_fields = self.initial.get('default_fields') or {}
+        # don't change the initial data of the caller
+        self.initial = dict(self.initial)
+        fields = []
+        for field_name, name, key, form_field in self.get_schema(
+                project_fields):
+            # the choices are shared, only the field and widget are copied
+            form_field = copy.copy(form_field)
+            form_field.widget = copy.copy(form_field.widget)
+            self.fields[field_name] = form_field
+            self.project_field_names[field_name] = name
+            initial = default_fields.get(key)
+            if initial and field_name not in self.initial:
+                if isinstance(form_field, forms.MultipleChoiceField):
+                    initial = initial.split(',')
+                self.initial[field_name] = initial
+            fields.append(form_field)
         return fields
 
     def get_project_field_values(self):
@@ -53,31 +168,57 @@ class YouTrackProjectForm(forms.Form):
             values[name] = self.cleaned_data.get(form_field_name)
         return values
 
-    def _get_initial(self, field_name):
-        default_fields = self.initial.get('default_fields') or {}
-        field_key = md5(unidecode(field_name)).hexdigest()
-        return default_fields.get(field_key)
-
-    def _get_form_field(self, project_field):
+    @classmethod
+    def _get_form_field(cls, project_field):
         field_type = project_field['type']
         field_values = project_field['values']
-        form_field = self.FIELD_TYPE_MAPPING.get(field_type)
+        form_field = cls.FIELD_TYPE_MAPPING.get(field_type)
         kwargs = {
             'label': project_field['name'],
-            'required': False,
-            'initial': self._get_initial(project_field['name'])}
+            'required': False}
         if form_field:
             return form_field(**kwargs)
+        if field_values and len(field_values) > CHOICES_LIMIT:
+            return RemoteChoiceField(
+                field_values, multiple="[*]" in field_type, **kwargs)
         if field_values:
             choices = zip(field_values, field_values)
             if "[*]" in field_type:
-                if kwargs['initial']:
-                    kwargs['initial'] = kwargs['initial'].split(',')
                 return forms.MultipleChoiceField(choices=choices, **kwargs)
             kwargs['choices'] = [('', '-----')] + choices
             return forms.ChoiceField(**kwargs)
 
 
+def get_form_schema(form):
+    """Returns the fields of the form as a JSON serializable list, for
+    ``scripts.js`` to render them."""
+    schema = []
+    for name, field in form.fields.items():
+        bound_field = form[name]
+        widget = field.widget
+        item = {
+            'name': bound_field.html_name,
+            'id': bound_field.auto_id,
+            'label': force_text(field.label or ''),
+            'help_text': force_text(field.help_text or ''),
+            'required': field.required,
+            'value': bound_field.value(),
+            'attrs': dict((key, force_text(value))
+                          for key, value in widget.attrs.items()),
+            'widget': 'text'}
+        if isinstance(field, RemoteChoiceField):
+            item['widget'] = 'remote'
+        elif isinstance(field, forms.ChoiceField):
+            item['widget'] = 'select'
+            item['multiple'] = isinstance(field, forms.MultipleChoiceField)
+            item['choices'] = [(force_text(value), force_text(label))
+                               for value, label in field.choices]
+        elif isinstance(widget, forms.Textarea):
+            item['widget'] = 'textarea'
+        schema.append(item)
+    return schema
+
+
 class NewIssueForm(YouTrackProjectForm):
 
     title = forms.CharField(
@@ -121,7 +262,7 @@ class DefaultFieldForm(forms.Form):
         data = self.cleaned_data
         default_fields = self.plugin.get_option(
             self.plugin.default_fields_key, self.project) or {}
-        default_fields[md5(unidecode(data['field'])).hexdigest()] = data['value']
+        default_fields[get_field_key(data['field'])] = data['value']
         self.plugin.set_option(
             self.plugin.default_fields_key, default_fields, self.project)
 
@@ -130,6 +271,7 @@ class YouTrackConfigurationForm(forms.Form):
 
     error_message = {
         'client': _("Unable to connect to YouTrack."),
+        'unavailable': _("YouTrack is unavailable, please try again later."),
         'invalid_ssl': _("SSL certificate  verification failed."),
         'invalid_password': _('Invalid username or password.'),
         'invalid_project': _('Invalid project: \'%s\''),
@@ -170,6 +312,7 @@ class YouTrackConfigurationForm(forms.Form):
     def __init__(self, *args, **kwargs):
         super(YouTrackConfigurationForm, self).__init__(*args, **kwargs)
         self.client_errors = {}
+        self.clients = {}
 
         initial = kwargs.get("initial")
         if initial:
@@ -177,15 +320,24 @@ class YouTrackConfigurationForm(forms.Form):
             if not client:
                 self.remove_fields()
             else:
-                if initial.get('project'):
-                    choices = self.get_ignore_field_choices(
-                        client, initial.get('project'))
-                    self.fields['ignore_fields'].choices = choices
-
-                choices = self.get_project_field_choices(
-                    client, initial.get('project'))
+                project = initial.get('project')
+                pool = None
+                if project:
+                    # fetch the fields while the projects are fetched
+                    pool = ThreadPool(1)
+                    ignore_field_choices = pool.apply_async(
+                        self.get_ignore_field_choices, (client, project))
+
+                choices = self.get_project_field_choices(client, project)
                 self.fields["project"].choices = choices
 
+                if pool is not None:
+                    try:
+                        self.fields['ignore_fields'].choices = (
+                            ignore_field_choices.get())
+                    finally:
+                        pool.terminate()
+
                 if not any(args) and not initial.get('project'):
                     self.second_step_msg = _(
                         "Your credentials are valid but plugin is NOT active "
@@ -209,6 +361,8 @@ class YouTrackConfigurationForm(forms.Form):
         except HTTPError:
             self.client_errors['project'] = self.error_message[
                 'invalid_project'] % (project,)
+        except (ConnectionError, Timeout):
+            self.client_errors['url'] = self.error_message['unavailable']
         else:
             names = [field['name'] for field in fields]
             return zip(names, names)
@@ -216,29 +370,54 @@ class YouTrackConfigurationForm(forms.Form):
 
     def get_project_field_choices(self, client, project):
         choices = [(' ', u"- Choose project -")]
-        try:
-            projects = list(client.get_projects())
-        except HTTPError:
-            self.client_errors['project'] = self.error_message[
-                'invalid_project'] % (project, )
-        else:
-            for project in projects:
-                display = "%s (%s)" % (project['name'], project['id'])
-                choices.append((project['id'], display))
+        key = (client.url, client.token_key or client.api_key)
+        projects = project_cache.get(key)
+        if projects is None:
+            try:
+                projects = list(client.get_projects())
+            except HTTPError:
+                self.client_errors['project'] = self.error_message[
+                    'invalid_project'] % (project, )
+            except (ConnectionError, Timeout):
+                self.client_errors['url'] = self.error_message['unavailable']
+            else:
+                project_cache.set(
+                    key, projects, time.time() + PROJECTS_CACHE_TIMEOUT)
+        for project in projects or []:
+            display = "%s (%s)" % (project['name'], project['id'])
+            choices.append((project['id'], display))
         return choices
 
     def get_youtrack_client(self, data, additional_params=None):
+        """Returns a client logged in with the credentials from ``data``,
+        or ``None`` when they are invalid.
+
+        Credentials are validated once per form, so ``clean`` reuses the
+        client of ``__init__`` unless they have changed.
+        """
+        key = ((data.get('url') or '').rstrip('/'), data.get('username'),
+               data.get('password'))
+        if not additional_params and key in self.clients:
+            return self.clients[key]
         yt_settings = {
             'url': data.get('url'),
             'username': data.get('username'),
             'password': data.get('password'),
-            'verify_ssl_certificate': VERIFY_SSL_CERTIFICATE}
+            'verify_ssl_certificate': VERIFY_SSL_CERTIFICATE,
+            'pool_size': CONNECTION_POOL_SIZE,
+            'timeout': TIMEOUT,
+            'retries': RETRIES,
+            'retry_backoff': RETRY_BACKOFF,
+            'failure_threshold': CIRCUIT_BREAKER_THRESHOLD,
+            'reset_timeout': CIRCUIT_BREAKER_TIMEOUT}
         if additional_params:
             yt_settings.update(additional_params)
 
         client = None
         try:
             client = YouTrackClient(**yt_settings)
+        except (CircuitOpenError, Timeout):
+            self.client_errors['url'] = self.error_message['unavailable']
         except (HTTPError, ConnectionError) as e:
             if e.response is not None and e.response.status_code == 403:
                 self.client_errors['username'] = self.error_message[
@@ -247,13 +426,22 @@ class YouTrackConfigurationForm(forms.Form):
                 self.client_errors['url'] = self.error_message['client']
         except (SSLError, TypeError) as e:
             self.client_errors['url'] = self.error_message['invalid_ssl']
-        if client:
+        if client and not validated_users.get(client.token_key):
             try:
                 client.get_user(yt_settings.get('username'))
             except HTTPError as e:
                 if e.response.status_code == 403:
                     self.client_errors['username'] = self.error_message['perms']
                     client = None
+            except (ConnectionError, Timeout):
+                self.client_errors['url'] = self.error_message['unavailable']
+                client = None
+            else:
+                validated_users.set(
+                    client.token_key, True,
+                    time.time() + PROJECTS_CACHE_TIMEOUT)
+        if not additional_params:
+            self.clients[key] = client
         return client
 
     def clean_password(self):
@@ -0,0 +1,128 @@
+import time
+from itertools import islice
+
+from django.conf import settings
+from sentry.utils.cache import cache
+
+from .utils import get_cache_key
+
+
+INDEX_SIZE = getattr(settings, 'YOUTRACK_ISSUE_INDEX_SIZE', 10000)
+INDEX_SYNC_INTERVAL = getattr(
+    settings, 'YOUTRACK_ISSUE_INDEX_SYNC_INTERVAL', 60)
+INDEX_TIMEOUT = 60 * 60 * 24
+
+
+def get_issue_number(issue_id):
+    try:
+        return int(issue_id.rsplit('-', 1)[-1])
+    except ValueError:
+        return 0
+
+
+class IssueIndex(object):
+    """Local index of the issues of a YouTrack project.
+
+    Keeps the id, summary and state of up to ``YOUTRACK_ISSUE_INDEX_SIZE``
+    most recent issues in the cache, newest first. The index is built by
+    ``sync``, which after the first run only fetches issues updated since
+    the previous one. Issues are stored in chunks of ``CHUNK_SIZE``, so
+    no cached value is too big for memcached.
+    """
+
+    PAGE_SIZE = 500
+    CHUNK_SIZE = 1000
+    # issues updated while the previous sync was running are fetched again
+    SYNC_OVERLAP = 60
+
+    def __init__(self, url, project_id):
+        self.project_id = project_id
+        self.key = 'youtrack:issue-index:%s' % get_cache_key(url, project_id)
+        self.data = None
+
+    def _get_chunk_keys(self, record):
+        return ['%s:%s:%d' % (self.key, record['version'], number)
+                for number in range(record['chunks'])]
+
+    def load(self):
+        self.data = None
+        record = cache.get(self.key)
+        if record is None:
+            return None
+        keys = self._get_chunk_keys(record)
+        chunks = cache.get_many(keys)
+        if len(chunks) < len(keys):
+            return None
+        issues = []
+        for key in keys:
+            issues.extend(chunks[key])
+        self.data = {'issues': issues, 'synced_at': record['synced_at']}
+        return self.data
+
+    def save(self):
+        issues = self.data['issues']
+        # chunks of every sync have their own keys, so the index is never
+        # loaded with chunks of different syncs
+        record = {'synced_at': self.data['synced_at'],
+                  'version': int(self.data['synced_at'] * 1000),
+                  'chunks': (len(issues) + self.CHUNK_SIZE - 1) //
+                  self.CHUNK_SIZE}
+        cache.set_many(dict(
+            (key, issues[number * self.CHUNK_SIZE:
+                         (number + 1) * self.CHUNK_SIZE])
+            for number, key in enumerate(self._get_chunk_keys(record))),
+            INDEX_TIMEOUT)
+        cache.set(self.key, record, INDEX_TIMEOUT)
+
+    def is_stale(self):
+        return (self.data is None or
+                self.data['synced_at'] + INDEX_SYNC_INTERVAL < time.time())
+
+    def schedule_sync(self):
+        """Returns whether no other sync has been scheduled recently."""
+        return cache.add('%s:sync' % self.key, 1, INDEX_SYNC_INTERVAL)
+
+    def sync(self, client):
+        data = self.load() or {'issues': [], 'synced_at': None}
+        synced_at = time.time()
+        updated_after = None
+        query = 'sort by: created desc'
+        if data['synced_at'] is not None:
+            updated_after = int((data['synced_at'] - self.SYNC_OVERLAP) * 1000)
+            query = 'sort by: updated desc'
+
+        # older issues wouldn't make it to the index anyway
+        updated = {}
+        for issue in islice(client.iter_project_issues(
+                self.project_id, query=query, updated_after=updated_after,
+                page_size=min(self.PAGE_SIZE, INDEX_SIZE)), INDEX_SIZE):
+            updated[issue['id']] = issue
+
+        issues = [issue for issue in data['issues']
+                  if issue['id'] not in updated]
+        issues.extend(updated.values())
+        issues.sort(key=lambda issue: get_issue_number(issue['id']),
+                    reverse=True)
+        self.data = {'issues': issues[:INDEX_SIZE], 'synced_at': synced_at}
+        self.save()
+        return self.data
+
+    def search(self, query=None, offset=0, limit=15):
+        """Returns issues matching ``query`` and whether there are more.
+
+        Issues whose id starts with the query (or whose number does) come
+        first, followed by issues with the query in their summary.
+        """
+        issues = self.data['issues']
+        if query:
+            query = query.strip().lower()
+            by_id, by_summary = [], []
+            for issue in issues:
+                issue_id = issue['id'].lower()
+                if (issue_id.startswith(query) or
+                        issue_id.rsplit('-', 1)[-1].startswith(query)):
+                    by_id.append(issue)
+                elif query in (issue['summary'] or '').lower():
+                    by_summary.append(issue)
+            issues = by_id + by_summary
+        return issues[offset:offset + limit], len(issues) > offset + limit
@@ -0,0 +1,20 @@
+from django.conf import settings
+from sentry.utils import metrics as sentry_metrics
+
+from .youtrack import null_metrics
+
+
+METRICS_ENABLED = getattr(settings, 'YOUTRACK_METRICS_ENABLED', True)
+
+
+class SentryMetrics(object):
+    """Sends metrics of the plugin through the metrics backend of Sentry."""
+
+    def timing(self, key, value, tags=None):
+        sentry_metrics.timing(key, value, tags=tags)
+
+    def incr(self, key, amount=1, tags=None):
+        sentry_metrics.incr(key, amount, tags=tags)
+
+
+metrics = SentryMetrics() if METRICS_ENABLED else null_metrics
@@ -0,0 +1,136 @@
+import json
+import random
+import time
+import uuid
+
+from django.conf import settings
+from sentry.models import GroupMeta
+
+from .youtrack import YouTrackCommandError
+
+
+ASYNC_CREATE = getattr(settings, 'YOUTRACK_ASYNC_CREATE', False)
+OUTBOX_MAX_ATTEMPTS = getattr(settings, 'YOUTRACK_OUTBOX_MAX_ATTEMPTS', 8)
+OUTBOX_RETRY_DELAY = getattr(settings, 'YOUTRACK_OUTBOX_RETRY_DELAY', 30)
+OUTBOX_MAX_RETRY_DELAY = getattr(
+    settings, 'YOUTRACK_OUTBOX_MAX_RETRY_DELAY', 60 * 60)
+
+PENDING = 'pending'
+FAILED = 'failed'
+
+
+def get_retry_delay(attempts):
+    """Returns the exponential backoff delay, randomly shortened by up to a
+    half so retries of many records don't happen at once."""
+    delay = min(OUTBOX_MAX_RETRY_DELAY, OUTBOX_RETRY_DELAY * 2 ** attempts)
+    return random.uniform(delay / 2.0, delay)
+
+
+class IssueOutbox(object):
+    """Issue of a group which is being created in the background.
+
+    The record is kept as a JSON ``GroupMeta`` value until the issue is
+    created, its fields and tags are set and the group is linked to it.
+    The issue id is saved as soon as the issue exists, so retries never
+    create it again. The idempotency key is added to the description to
+    find the issue when the worker died before saving its id.
+    """
+
+    def __init__(self, group, prefix):
+        self.group = group
+        self.key = '%s:outbox' % prefix
+        self.record = None
+
+    def load(self):
+        # get_value needs the GroupMeta cache, which tasks don't populate
+        value = (GroupMeta.objects.filter(group=self.group, key=self.key)
+                 .values_list('value', flat=True).first())
+        self.record = json.loads(value) if value else None
+        return self.record
+
+    def save(self):
+        GroupMeta.objects.set_value(
+            self.group, self.key, json.dumps(self.record))
+
+    def delete(self):
+        GroupMeta.objects.unset_value(self.group, self.key)
+        self.record = None
+
+    def create(self, issue_data, commands, user_id=None):
+        key = uuid.uuid4().hex
+        issue_data = dict(issue_data)
+        issue_data['description'] = u'%s\n\n%s' % (
+            issue_data.get('description') or '', key)
+        self.record = {
+            'key': key,
+            'issue': issue_data,
+            'commands': list(commands),
+            'user_id': user_id,
+            'issue_id': None,
+            'started': False,
+            'status': PENDING,
+            'attempts': 0,
+            'retry_at': time.time(),
+            'error': None,
+            'warning': None}
+        self.save()
+        return self.record
+
+    def is_pending(self):
+        return self.record is not None and self.record['status'] == PENDING
+
+    def find_issue(self, client):
+        record = self.record
+        issues = client.get_project_issues(
+            record['issue']['project'], query='"%s"' % record['key'], limit=1)
+        if issues:
+            return issues[0]['id']
+
+    def process(self, client):
+        """Runs the remaining steps and returns the id of the issue.
+
+        Errors worth retrying are raised. Fields and tags which YouTrack
+        rejects are only reported, as the issue is created anyway.
+        """
+        record = self.record
+        if record['issue_id'] is None:
+            issue_id = None
+            if record['started']:
+                issue_id = self.find_issue(client)
+            else:
+                record['started'] = True
+                self.save()
+            record['issue_id'] = (
+                issue_id or client.create_issue(record['issue']))
+            self.save()
+        if record['commands']:
+            try:
+                client.execute_commands(record['issue_id'], record['commands'])
+            except YouTrackCommandError as e:
+                record['warning'] = u'%s' % e
+            record['commands'] = []
+            self.save()
+        return record['issue_id']
+
+    def retry(self, error):
+        """Schedules another attempt and returns its delay.
+
+        Returns ``None`` and marks the record as failed when there are no
+        attempts left.
+        """
+        record = self.record
+        record['attempts'] += 1
+        record['error'] = u'%s' % error
+        delay = None
+        if record['attempts'] < OUTBOX_MAX_ATTEMPTS:
+            delay = get_retry_delay(record['attempts'])
+            record['retry_at'] = time.time() + delay
+        else:
+            record['status'] = FAILED
+        self.save()
+        return delay
+
+    def restart(self):
+        self.record.update(status=PENDING, attempts=0, error=None,
+                           retry_at=time.time())
+        self.save()
@@ -0,0 +1,182 @@
+from io import BytesIO
+
+from bs4 import BeautifulSoup
+
+try:
+    from xml.etree import cElementTree as ElementTree
+except ImportError:
+    from xml.etree import ElementTree
+
+try:
+    text_type = unicode
+except NameError:
+    text_type = str
+
+
+class SoupParser(object):
+    """Parses YouTrack responses into BeautifulSoup trees."""
+
+    def _soup(self, content):
+        return BeautifulSoup(content, 'xml')
+
+    def get_error(self, content):
+        error = self._soup(content).find('error')
+        if error is not None:
+            return error.text
+
+    def is_login(self, content):
+        return self._soup(content).login is not None
+
+    def get_project_name(self, content):
+        return self._soup(content).project['name']
+
+    def get_user(self, content):
+        user = self._soup(content).user
+        if user is not None:
+            return dict(user.attrs)
+
+    def get_projects(self, content):
+        for project in self._soup(content).projects:
+            yield {'id': project['shortName'], 'name': project['name']}
+
+    def get_issues(self, content):
+        for issue in self._soup(content).issues:
+            state = issue.find('field', {'name': 'State'})
+            summary = issue.find('field', {'name': 'summary'})
+            yield {
+                'id': issue['id'],
+                'state': None if state is None else state.value.text,
+                'summary': None if summary is None else summary.text}
+
+    def get_issue_id(self, content):
+        return self._soup(content).issue['id']
+
+    def get_project_field_refs(self, content):
+        for field in self._soup(content).projectCustomFieldRefs:
+            yield {'name': field['name'], 'url': field['url']}
+
+    def get_project_field(self, content):
+        soup = self._soup(content)
+        field = soup.projectCustomField
+        return {
+            'name': field['name'],
+            'type': field['type'],
+            'empty_text': field['emptyText'],
+            'param': soup.param['value'] if soup.param else None}
+
+    def get_bundle_values(self, content, bundle):
+        return [item.text for item in getattr(self._soup(content), bundle)]
+
+    def get_user_bundle(self, content):
+        bundle = self._soup(content).userBundle
+        logins = [user['login'] for user in bundle.findAll('user')]
+        groups = [group['name'] for group in bundle.findAll('userGroup')]
+        return logins, groups
+
+    def get_user_logins(self, content):
+        return [user['login'] for user in
+                self._soup(content).userRefs.findAll('user')]
+
+
+class IterParser(object):
+    """Parses YouTrack responses incrementally.
+
+    Lists are yielded item by item, and items which have been read are
+    dropped from the tree, so the memory used doesn't depend on the size of
+    the response.
+    """
+
+    def _iterparse(self, content):
+        return ElementTree.iterparse(BytesIO(content), events=('start', 'end'))
+
+    def _root(self, content):
+        # the attributes are known as soon as the root element starts
+        for event, element in self._iterparse(content):
+            return element
+
+    def _items(self, content, tag=None):
+        depth = 0
+        root = None
+        for event, element in self._iterparse(content):
+            if event == 'start':
+                depth += 1
+                if root is None:
+                    root = element
+                continue
+            depth -= 1
+            if depth == 1:
+                if tag is None or element.tag == tag:
+                    yield element
+                root.remove(element)
+
+    def _text(self, element):
+        return text_type(''.join(element.itertext()))
+
+    def _attr(self, element, name):
+        return text_type(element.get(name))
+
+    def get_error(self, content):
+        if self._root(content).tag == 'error':
+            return self._text(ElementTree.fromstring(content))
+
+    def is_login(self, content):
+        try:
+            return self._root(content).tag == 'login'
+        except ElementTree.ParseError:
+            return False
+
+    def get_project_name(self, content):
+        return self._attr(self._root(content), 'name')
+
+    def get_user(self, content):
+        root = self._root(content)
+        if root.tag == 'user':
+            return dict((key, text_type(value))
+                        for key, value in root.attrib.items())
+
+    def get_projects(self, content):
+        for project in self._items(content, 'project'):
+            yield {'id': self._attr(project, 'shortName'),
+                   'name': self._attr(project, 'name')}
+
+    def get_issues(self, content):
+        for issue in self._items(content, 'issue'):
+            state = issue.find("field[@name='State']/value")
+            summary = issue.find("field[@name='summary']")
+            yield {
+                'id': self._attr(issue, 'id'),
+                'state': None if state is None else self._text(state),
+                'summary': None if summary is None else self._text(summary)}
+
+    def get_issue_id(self, content):
+        return self._attr(self._root(content), 'id')
+
+    def get_project_field_refs(self, content):
+        for field in self._items(content, 'projectCustomField'):
+            yield {'name': self._attr(field, 'name'),
+                   'url': self._attr(field, 'url')}
+
+    def get_project_field(self, content):
+        field = ElementTree.fromstring(content)
+        param = field.find('param')
+        return {
+            'name': self._attr(field, 'name'),
+            'type': self._attr(field, 'type'),
+            'empty_text': self._attr(field, 'emptyText'),
+            'param': self._attr(param, 'value') if param is not None else None}
+
+    def get_bundle_values(self, content, bundle):
+        return [self._text(item) for item in self._items(content)]
+
+    def get_user_bundle(self, content):
+        logins, groups = [], []
+        for item in self._items(content):
+            if item.tag == 'user':
+                logins.append(self._attr(item, 'login'))
+            elif item.tag == 'userGroup':
+                groups.append(self._attr(item, 'name'))
+        return logins, groups
+
+    def get_user_logins(self, content):
+        return [self._attr(user, 'login')
+                for user in self._items(content, 'user')]
@@ -1,19 +1,38 @@
 # -*- encoding: utf-8 -*-
 import json
+import logging
+import time
 
 from django import forms
+from django.contrib import messages
 from django.core.serializers.json import DjangoJSONEncoder
-from django.http import HttpResponse
-from django.utils.translation import ugettext_lazy as _
-from sentry.models import GroupMeta
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.html import format_html
+from django.utils.translation import get_language, ugettext_lazy as _
+from requests.exceptions import ConnectionError, RequestException, Timeout
+from sentry.models import Activity, Event, GroupMeta
 from sentry.plugins.bases.issue import IssuePlugin
+from sentry.utils.cache import cache
 
 from . import VERSION
 from .forms import (NewIssueForm, AssignIssueForm, DefaultFieldForm,
                     YouTrackConfigurationForm, YouTrackProjectForm,
-                    VERIFY_SSL_CERTIFICATE)
-from .utils import cache_this, get_int
-from .youtrack import YouTrackClient
+                    get_field_key, get_form_schema,
+                    VERIFY_SSL_CERTIFICATE, CONNECTION_POOL_SIZE, TIMEOUT,
+                    RETRIES, RETRY_BACKOFF, CIRCUIT_BREAKER_THRESHOLD,
+                    CIRCUIT_BREAKER_TIMEOUT, MAX_WORKERS,
+                    FIELDS_CACHE_TIMEOUT, GROUP_CACHE_TIMEOUT)
+from .index import IssueIndex
+from .metrics import metrics
+from .outbox import ASYNC_CREATE, IssueOutbox
+from .states import STATE_PREFETCH_LIMIT, IssueStates
+from .tasks import create_outbox_issue, fetch_issue_states, sync_issue_index
+from .utils import cache_this, get_cache_key, get_int
+from .youtrack import YouTrackClient, YouTrackCommandError, YouTrackError
+
+
+logger = logging.getLogger(__name__)
 
 
 class YouTrackPlugin(IssuePlugin):
@@ -28,11 +47,15 @@ class YouTrackPlugin(IssuePlugin):
     assign_issue_form = AssignIssueForm
     create_issue_template = "sentry_youtrack/create_issue_form.html"
     assign_issue_template = "sentry_youtrack/assign_issue_form.html"
+    issue_outbox_template = "sentry_youtrack/issue_outbox.html"
     project_conf_form = YouTrackConfigurationForm
     project_conf_template = "sentry_youtrack/project_conf_form.html"
     project_fields_form = YouTrackProjectForm
     default_fields_key = 'default_fields'
 
+    unavailable_message = _(
+        "YouTrack is unavailable at the moment, please try again later.")
+
     resource_links = [
         (_("Bug Tracker"), "https://github.com/bogdal/sentry-youtrack/issues"),
         (_("Source"), "http://github.com/bogdal/sentry-youtrack")]
@@ -45,16 +68,175 @@ class YouTrackPlugin(IssuePlugin):
             'url': self.get_option('url', project),
             'username': self.get_option('username', project),
             'password': self.get_option('password', project),
-            'verify_ssl_certificate': VERIFY_SSL_CERTIFICATE}
+            'verify_ssl_certificate': VERIFY_SSL_CERTIFICATE,
+            'pool_size': CONNECTION_POOL_SIZE,
+            'timeout': TIMEOUT,
+            'retries': RETRIES,
+            'retry_backoff': RETRY_BACKOFF,
+            'failure_threshold': CIRCUIT_BREAKER_THRESHOLD,
+            'reset_timeout': CIRCUIT_BREAKER_TIMEOUT,
+            'max_workers': MAX_WORKERS,
+            'group_cache_timeout': GROUP_CACHE_TIMEOUT,
+            'metrics': metrics}
         return YouTrackClient(**settings)
 
-    def get_project_fields(self, project):
-        @cache_this(600)
-        def cached_fields(ignore_fields):
+    def _get_cached(self, cached_func, args, refresh_within=None):
+        if refresh_within is not None:
+            ttl = cached_func.ttl(*args)
+            if ttl is None or ttl < refresh_within:
+                return cached_func.refresh(*args)
+        return cached_func(*args)
+
+    def get_bundle_values(self, project, bundles, refresh_within=None):
+        """Returns values of the bundles, cached for the YouTrack instance.
+
+        Bundles are often used by many projects, so they're cached
+        separately from project fields. Bundles which aren't cached, or
+        expire within ``refresh_within`` seconds, are fetched concurrently
+        by one client.
+        """
+        @cache_this(FIELDS_CACHE_TIMEOUT)
+        def cached_bundle_values(url, bundle):
+            # bundles are dicts, so they're looked up by their cache key
+            key = get_cache_key(bundle)
+            if key in fetched:
+                values = fetched[key]
+            elif errors:
+                raise errors[0]
+            else:
+                values = yt_client.get_bundle_values(bundle)
+            cache.set(self._get_fields_version_key(url, bundle), time.time(),
+                      FIELDS_CACHE_TIMEOUT * 2)
+            return values
+
+        url = self.get_option('url', project)
+        yt_client = self.get_youtrack_client(project)
+        expired = []
+        for bundle in bundles:
+            ttl = cached_bundle_values.ttl(url, bundle)
+            if ttl is None or ttl < (refresh_within or 0):
+                expired.append(bundle)
+        fetched, errors = {}, []
+        if expired:
+            try:
+                fetched = dict(zip(
+                    [get_cache_key(bundle) for bundle in expired],
+                    yt_client.get_bundles_values(expired)))
+            except (RequestException, YouTrackError) as e:
+                # cached values are returned while they aren't too stale
+                errors.append(e)
+        return [self._get_cached(cached_bundle_values, (url, bundle),
+                                 refresh_within)
+                for bundle in bundles]
+
+    def get_project_fields(self, project, refresh_within=None):
+        """Returns the cached fields of the linked YouTrack project.
+
+        With ``refresh_within`` the fields are fetched again when the cached
+        ones expire in less than that many seconds.
+        """
+        @cache_this(FIELDS_CACHE_TIMEOUT)
+        def cached_field_schemas(url, project_id, ignore_fields):
             yt_client = self.get_youtrack_client(project)
-            return list(yt_client.get_project_fields(
-                self.get_option('project', project), ignore_fields))
-        return cached_fields(self.get_option('ignore_fields', project))
+            schemas = list(yt_client.get_project_field_schemas(
+                project_id, ignore_fields))
+            bundle_keys = [
+                self._get_fields_version_key(url, schema['bundle'])
+                for schema in schemas if schema['bundle']]
+            cache.set(
+                self._get_fields_version_key(url, project_id, ignore_fields),
+                {'version': time.time(), 'bundles': bundle_keys},
+                FIELDS_CACHE_TIMEOUT * 2)
+            return schemas
+        args = (self.get_option('url', project),
+                self.get_option('project', project),
+                self.get_option('ignore_fields', project))
+        schemas = self._get_cached(cached_field_schemas, args, refresh_within)
+
+        bundles = []
+        for schema in schemas:
+            if schema['bundle'] and schema['bundle'] not in bundles:
+                bundles.append(schema['bundle'])
+        values = self.get_bundle_values(project, bundles, refresh_within)
+
+        fields = []
+        for schema in schemas:
+            field = dict(schema, values=None)
+            bundle = field.pop('bundle')
+            if bundle:
+                field['values'] = values[bundles.index(bundle)]
+            fields.append(field)
+        return fields
+
+    def _get_fields_version_key(self, *args):
+        return 'youtrack:fields-version:%s' % get_cache_key(*args)
+
+    def get_project_fields_version(self, project):
+        """Returns the versions of the cached field schemas and bundles of
+        the project, or ``None`` when some of them aren't cached.
+
+        They change whenever the fields are fetched again, and are read
+        without loading the fields from the cache.
+        """
+        record = cache.get(self._get_fields_version_key(
+            self.get_option('url', project),
+            self.get_option('project', project),
+            self.get_option('ignore_fields', project)))
+        if record is None:
+            return None
+        versions = cache.get_many(record['bundles'])
+        if len(versions) < len(set(record['bundles'])):
+            return None
+        return [record['version']] + [versions[key]
+                                      for key in record['bundles']]
+
+    def get_issue_index(self, project):
+        return IssueIndex(self.get_option('url', project),
+                          self.get_option('project', project))
+
+    def sync_issue_index(self, project):
+        index = self.get_issue_index(project)
+        return index.sync(self.get_youtrack_client(project))
+
+    def get_issue_states_cache(self, project):
+        return IssueStates(self.get_option('url', project),
+                           self.get_option('project', project))
+
+    def get_issue_states(self, project, issue_ids):
+        """Returns the cached states of the linked YouTrack issues by
+        issue id.
+
+        When some of them aren't cached, the ``fetch_issue_states`` task is
+        scheduled to fetch them, so rendering a stream page never waits
+        for YouTrack.
+        """
+        issue_states = self.get_issue_states_cache(project)
+        states = issue_states.get_cached(issue_ids)
+        missing = set(issue_ids) - set(states)
+        if missing and issue_states.schedule_fetch():
+            fetch_issue_states.delay(project_id=project.id,
+                                     issue_ids=list(missing))
+        return states
+
+    def fetch_issue_states(self, project, issue_ids=()):
+        """Fetches the states of the issues which aren't cached in a few
+        batched requests.
+
+        Along with ``issue_ids`` the states of the issues linked to groups
+        of the project are fetched, up to
+        ``YOUTRACK_ISSUE_STATE_PREFETCH_LIMIT`` most recently linked ones.
+        """
+        issue_states = self.get_issue_states_cache(project)
+        linked = set(GroupMeta.objects.filter(
+            group__project=project, key='%s:tid' % self.get_conf_key(),
+        ).order_by('-id').values_list('value', flat=True)[
+            :STATE_PREFETCH_LIMIT])
+        linked.update(issue_ids)
+        missing = linked - set(issue_states.get_cached(linked))
+        return issue_states.fetch(self.get_youtrack_client(project), missing)
+
+    def invalidate_issue_states(self, project, issue_ids):
+        self.get_issue_states_cache(project).invalidate(issue_ids)
 
     def get_initial_form_data(self, request, group, event, **kwargs):
         initial = {
@@ -73,35 +255,193 @@ class YouTrackPlugin(IssuePlugin):
 
     def get_new_issue_form(self, request, group, event, **kwargs):
         if request.POST or request.GET.get('form'):
+            try:
+                project_fields = self.get_project_fields(group.project)
+            except (ConnectionError, Timeout):
+                # still show the form, creating the issue will fail with
+                # a message if YouTrack doesn't come back in the meantime
+                messages.add_message(
+                    request, messages.WARNING, self.unavailable_message)
+                project_fields = []
             return self.new_issue_form(
-                project_fields=self.get_project_fields(group.project),
+                project_fields=project_fields,
                 data=request.POST or None,
                 initial=self.get_initial_form_data(request, group, event))
         return forms.Form()
 
     def create_issue(self, request, group, form_data, **kwargs):
-        project_fields = self.get_project_fields(group.project)
+        try:
+            project_fields = self.get_project_fields(group.project)
+            yt_client = self.get_youtrack_client(group.project)
+        except (ConnectionError, Timeout):
+            raise forms.ValidationError(self.unavailable_message)
         project_form = self.project_fields_form(project_fields, request.POST)
         project_field_values = project_form.get_project_field_values()
-
-        tags = filter(None, map(lambda x: x.strip(),
-                                form_data['tags'].split(',')))
-        yt_client = self.get_youtrack_client(group.project)
+        commands = self.get_issue_commands(project_field_values,
+                                           form_data['tags'])
 
         issue_data = {
             'project': self.get_option('project', group.project),
             'summary': form_data.get('title'),
             'description': form_data.get('description')}
-        issue_id = yt_client.create_issue(issue_data)
+        try:
+            issue_id = yt_client.create_issue(issue_data)
+        except (ConnectionError, Timeout):
+            raise forms.ValidationError(self.unavailable_message)
+        try:
+            yt_client.execute_commands(issue_id, commands)
+        except YouTrackCommandError as e:
+            # the issue exists, so link it anyway and let the user know
+            # which fields or tags are missing
+            messages.add_message(request, messages.WARNING, u'%s' % e)
+        self.invalidate_issue_states(group.project, [issue_id])
+        return issue_id
 
+    def get_issue_commands(self, project_field_values, tags):
+        tags = filter(None, map(lambda x: x.strip(), (tags or '').split(',')))
+        commands = []
         for field, value in project_field_values.iteritems():
             if value:
                 value = [value] if type(value) != list else value
                 cmd = map(lambda x: "%s %s" % (field, x), value)
-                yt_client.execute_command(issue_id, " ".join(cmd))
-        if tags:
-            yt_client.add_tags(issue_id, tags)
-        return issue_id
+                commands.append(" ".join(cmd))
+        commands.extend(u'add tag %s' % tag for tag in tags)
+        return commands
+
+    def get_default_field_values(self, project):
+        """Returns the default fields of the project by field name.
+
+        Defaults are saved by ``get_field_key`` of the field name, and
+        values of multi-value fields as a comma-separated string.
+        """
+        default_fields = self.get_option(
+            self.default_fields_key, project) or {}
+        values = {}
+        for field in self.get_project_fields(project):
+            value = default_fields.get(get_field_key(field['name']))
+            if value:
+                if "[*]" in field['type']:
+                    value = value.split(',')
+                values[field['name']] = value
+        return values
+
+    def create_issues(self, groups, user=None, project_field_values=None,
+                      tags=None, progress=None):
+        """Creates and links a YouTrack issue for each of the groups.
+
+        The groups have to belong to the same project, ``ValueError`` is
+        raised otherwise. Issues are created concurrently by one client,
+        with the same fields and tags, the project's default ones unless
+        given. ``user`` is the author of the issue activities. Returns
+        a dict of created issue ids and a dict of error messages, both
+        keyed by group id. A group can be in both when its issue was created
+        but some of the fields or tags couldn't be set. ``progress`` is
+        called with the numbers of finished and all groups.
+        """
+        groups = list(groups)
+        if not groups:
+            return {}, {}
+        if len(set(group.project_id for group in groups)) > 1:
+            raise ValueError('The groups belong to more than one project')
+        project = groups[0].project
+        if project_field_values is None:
+            project_field_values = self.get_default_field_values(project)
+        if tags is None:
+            tags = self.get_option('default_tags', project)
+        commands = self.get_issue_commands(project_field_values, tags)
+
+        events = [group.get_latest_event() for group in groups]
+        Event.objects.bind_nodes(filter(None, events), 'data')
+        issues = []
+        for group, event in zip(groups, events):
+            if event is None:
+                title, description = group.error(), ''
+            else:
+                title = self._get_group_title(None, group, event)
+                description = self._get_group_description(None, group, event)
+            issues.append({
+                'project': self.get_option('project', project),
+                'summary': title,
+                'description': description})
+
+        yt_client = self.get_youtrack_client(project)
+        results = yt_client.create_issues(issues, commands, progress)
+
+        issue_ids, errors = {}, {}
+        for group, (issue_id, error) in zip(groups, results):
+            if issue_id is not None:
+                issue_ids[group.id] = issue_id
+            if error is not None:
+                errors[group.id] = u'%s' % error
+        created = [group for group in groups if group.id in issue_ids]
+        self.link_issues(created, issue_ids)
+        Activity.objects.bulk_create([
+            Activity(project=project, group=group, user=user,
+                     type=Activity.CREATE_ISSUE,
+                     data={'title': issue['summary'],
+                           'provider': self.get_title(),
+                           'location': self.get_issue_url(
+                               group, issue_ids[group.id]),
+                           'label': self.get_issue_label(
+                               group, issue_ids[group.id])})
+            for group, issue in zip(groups, issues)
+            if group.id in issue_ids])
+        return issue_ids, errors
+
+    def link_issues(self, groups, issue_ids):
+        """Links the groups to YouTrack issues given by group id at once."""
+        groups = [group for group in groups if group.id in issue_ids]
+        if not groups:
+            return
+        key = '%s:tid' % self.get_conf_key()
+        with transaction.atomic():
+            GroupMeta.objects.filter(group__in=groups, key=key).delete()
+            GroupMeta.objects.bulk_create([
+                GroupMeta(group=group, key=key, value=issue_ids[group.id])
+                for group in groups])
+        GroupMeta.objects.populate_cache(groups)
+        self.invalidate_issue_states(
+            groups[0].project, [issue_ids[group.id] for group in groups])
+
+    def get_outbox(self, group):
+        return IssueOutbox(group, self.get_conf_key())
+
+    def enqueue_issue(self, request, group):
+        """Saves the issue to the outbox of the group to be created by
+        the ``create_outbox_issue`` task.
+
+        Returns ``False`` when the form isn't valid.
+        """
+        event = group.get_latest_event()
+        if event is not None:
+            Event.objects.bind_nodes([event], 'data')
+        form = self.get_new_issue_form(request, group, event)
+        if not form.is_valid():
+            return False
+        # the form has the project fields, unless YouTrack is unavailable
+        commands = self.get_issue_commands(
+            form.get_project_field_values(), form.cleaned_data['tags'])
+        issue_data = {
+            'project': self.get_option('project', group.project),
+            'summary': form.cleaned_data.get('title'),
+            'description': form.cleaned_data.get('description')}
+        self.get_outbox(group).create(issue_data, commands, request.user.id)
+        create_outbox_issue.delay(group_id=group.id)
+        return True
+
+    def link_outbox_issue(self, group, outbox, issue_id):
+        GroupMeta.objects.set_value(
+            group, '%s:tid' % self.get_conf_key(), issue_id)
+        self.invalidate_issue_states(group.project, [issue_id])
+        record = outbox.record
+        Activity.objects.create(
+            project=group.project, group=group, user_id=record['user_id'],
+            type=Activity.CREATE_ISSUE,
+            data={'title': record['issue']['summary'],
+                  'provider': self.get_title(),
+                  'location': self.get_issue_url(group, issue_id),
+                  'label': self.get_issue_label(group, issue_id)})
+        outbox.delete()
 
     def get_issue_url(self, group, issue_id, **kwargs):
         url = self.get_option('url', group.project).rstrip('/')
@@ -112,6 +452,29 @@ class YouTrackPlugin(IssuePlugin):
             return self.view(request, group)
         return super(YouTrackPlugin, self).get_view_response(request, group)
 
+    def tags(self, request, group, tag_list, **kwargs):
+        if not self.is_configured(request, group.project):
+            return tag_list
+        prefix = self.get_conf_key()
+        issue_id = GroupMeta.objects.get_value(group, '%s:tid' % prefix, None)
+        if not issue_id:
+            return tag_list
+        label = self.get_issue_label(group, issue_id)
+        try:
+            state = self.get_issue_states(
+                group.project, [issue_id]).get(issue_id)
+        except Exception:
+            # the label is shown anyway, only without the state
+            logger.warning('Unable to get the state of YouTrack issue %s',
+                           issue_id, exc_info=True)
+            state = None
+        if state:
+            label = u'%s (%s)' % (label, state)
+        tag_list.append(format_html(
+            '<a href="{}">{}</a>',
+            self.get_issue_url(group, issue_id), label))
+        return tag_list
+
     def actions(self, request, group, action_list, **kwargs):
         action_list = (super(YouTrackPlugin, self)
                        .actions(request, group, action_list, **kwargs))
@@ -127,15 +490,41 @@ class YouTrackPlugin(IssuePlugin):
             action_view = "%s_view" % request.GET.get('action')
             if request.GET.get('action') and hasattr(self, action_view):
                 return getattr(self, action_view)
-        view = get_action_view() or super(YouTrackPlugin, self).view
+        view = get_action_view()
+        if view is None and ASYNC_CREATE:
+            outbox = self.get_outbox(group)
+            if outbox.load() is not None:
+                return self.issue_outbox_view(request, group, outbox)
+            if request.POST and self.enqueue_issue(request, group):
+                return self.redirect(self.get_url(group))
+        view = view or super(YouTrackPlugin, self).view
         return view(request, group, **kwargs)
 
+    def issue_outbox_view(self, request, group, outbox=None):
+        if outbox is None:
+            outbox = self.get_outbox(group)
+            if outbox.load() is None:
+                return self.redirect(group.get_absolute_url())
+        if request.POST.get('retry') and not outbox.is_pending():
+            outbox.restart()
+            create_outbox_issue.delay(group_id=group.id)
+            return self.redirect(self.get_url(group))
+        if request.POST.get('discard') and not outbox.is_pending():
+            outbox.delete()
+            return self.redirect(group.get_absolute_url())
+        context = {
+            'record': outbox.record,
+            'pending': outbox.is_pending(),
+            'title': self.get_new_issue_title()}
+        return self.render(self.issue_outbox_template, context)
+
     def assign_issue_view(self, request, group):
         form = self.assign_issue_form(request.POST or None)
         if form.is_valid():
             issue_id = form.cleaned_data['issue']
             prefix = self.get_conf_key()
             GroupMeta.objects.set_value(group, '%s:tid' % prefix, issue_id)
+            self.invalidate_issue_states(group.project, [issue_id])
             return self.redirect(group.get_absolute_url())
         context = {
             'form': form,
@@ -148,16 +537,126 @@ class YouTrackPlugin(IssuePlugin):
         page_limit = get_int(request.POST.get('page_limit'), 15)
         offset = (page-1) * page_limit
 
-        yt_client = self.get_youtrack_client(group.project)
+        index = self.get_issue_index(group.project)
+        if index.load() is not None:
+            if index.is_stale() and index.schedule_sync():
+                sync_issue_index.delay(project_id=group.project.id)
+            issues, more = index.search(query, offset, page_limit)
+            if issues or not query or index.search(query, 0, 1)[0]:
+                data = {'more': more, 'issues': issues}
+                return HttpResponse(json.dumps(data, cls=DjangoJSONEncoder))
+            # issues older than the indexed ones are only found in YouTrack
+        elif index.schedule_sync():
+            # the index is being built, search in YouTrack in the meantime
+            sync_issue_index.delay(project_id=group.project.id)
         project_id = self.get_option('project', group.project)
-        project_issues = yt_client.get_project_issues(
-            project_id, offset=offset, limit=page_limit + 1, query=query)
+        try:
+            yt_client = self.get_youtrack_client(group.project)
+            project_issues = yt_client.get_project_issues(
+                project_id, offset=offset, limit=page_limit + 1, query=query)
+        except (ConnectionError, Timeout):
+            data = {'more': False, 'issues': [],
+                    'error': u'%s' % self.unavailable_message}
+            return HttpResponse(json.dumps(data, cls=DjangoJSONEncoder))
 
         data = {
             'more': len(project_issues) > page_limit,
             'issues': project_issues[:page_limit]}
         return HttpResponse(json.dumps(data, cls=DjangoJSONEncoder))
 
+    def form_schema_view(self, request, group):
+        """Returns the fields of the new issue form and their initial values
+        as JSON.
+
+        The browser revalidates the response with its ETag and gets a 304
+        response while the form wouldn't change, without building it.
+        """
+        event = group.get_latest_event()
+        etag = self.get_form_schema_etag(group, event)
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+        if (etag is not None and
+                etag in [tag.strip() for tag in if_none_match.split(',')]):
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+            return response
+
+        if event is not None:
+            Event.objects.bind_nodes([event], 'data')
+        data = {'error': None}
+        try:
+            project_fields = self.get_project_fields(group.project)
+        except (ConnectionError, Timeout):
+            project_fields = []
+            data['error'] = u'%s' % self.unavailable_message
+        form = self.new_issue_form(
+            project_fields=project_fields,
+            initial=self.get_initial_form_data(request, group, event))
+        data['fields'] = get_form_schema(form)
+
+        response = HttpResponse(json.dumps(data, cls=DjangoJSONEncoder),
+                                content_type='application/json')
+        if etag is None and not data['error']:
+            # the fields have just been cached
+            etag = self.get_form_schema_etag(group, event)
+        if etag is not None:
+            response['ETag'] = etag
+        # the initial values depend on the user, so only the browser may
+        # keep the response, and it has to revalidate it
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def get_form_schema_etag(self, group, event):
+        """Returns the ETag of the new issue form of the group, or ``None``
+        when the project fields aren't cached.
+
+        It's derived from the versions of the cached fields and from what
+        the initial values depend on, so checking it is cheap.
+        """
+        version = self.get_project_fields_version(group.project)
+        if version is None:
+            return None
+        return '"%s"' % get_cache_key(
+            VERSION, version, get_language(),
+            event.id if event is not None else None,
+            self.get_option(self.default_fields_key, group.project),
+            self.get_option('default_tags', group.project))
+
+    def field_values_view(self, request, group):
+        """Searches values of a project field, for the fields which have
+        too many values to be listed in the form."""
+        name = request.GET.get('field')
+        query = request.GET.get('q', '').strip().lower()
+        page = get_int(request.GET.get('page'), 1)
+        page_limit = get_int(request.GET.get('page_limit'), 30)
+        offset = (page - 1) * page_limit
+
+        try:
+            project_fields = self.get_project_fields(group.project)
+        except (ConnectionError, Timeout):
+            data = {'more': False, 'values': [],
+                    'error': u'%s' % self.unavailable_message}
+            return HttpResponse(json.dumps(data, cls=DjangoJSONEncoder))
+        values = []
+        for field in project_fields:
+            if field['name'] == name:
+                values = field['values'] or []
+                break
+        if query:
+            prefixed, others = [], []
+            for value in values:
+                lower_value = value.lower()
+                if lower_value.startswith(query):
+                    prefixed.append(value)
+                elif query in lower_value:
+                    others.append(value)
+            values = prefixed + others
+
+        data = {
+            'more': len(values) > offset + page_limit,
+            'values': values[offset:offset + page_limit]}
+        return HttpResponse(json.dumps(data, cls=DjangoJSONEncoder))
+
     def save_field_as_default_view(self, request, group):
         form = DefaultFieldForm(self, group.project, request.POST or None)
         if form.is_valid():
@@ -0,0 +1,62 @@
+from django.conf import settings
+from sentry.utils.cache import cache
+
+from .utils import get_cache_key
+
+
+STATE_CACHE_TIMEOUT = getattr(
+    settings, 'YOUTRACK_ISSUE_STATE_CACHE_TIMEOUT', 120)
+STATE_BATCH_SIZE = getattr(settings, 'YOUTRACK_ISSUE_STATE_BATCH_SIZE', 50)
+STATE_PREFETCH_LIMIT = getattr(
+    settings, 'YOUTRACK_ISSUE_STATE_PREFETCH_LIMIT', 500)
+STATE_FETCH_INTERVAL = getattr(
+    settings, 'YOUTRACK_ISSUE_STATE_FETCH_INTERVAL', 30)
+
+
+class IssueStates(object):
+    """Cached states of the YouTrack issues linked to Sentry groups.
+
+    States are cached by issue id for ``YOUTRACK_ISSUE_STATE_CACHE_TIMEOUT``
+    seconds. Issues which weren't found in the project are cached with
+    a ``None`` state, so they aren't searched for again and again.
+    """
+
+    def __init__(self, url, project_id):
+        self.project_id = project_id
+        self.key = 'youtrack:issue-state:%s' % get_cache_key(url, project_id)
+
+    def _get_key(self, issue_id):
+        return '%s:%s' % (self.key, issue_id)
+
+    def get_cached(self, issue_ids):
+        keys = dict((self._get_key(issue_id), issue_id)
+                    for issue_id in issue_ids)
+        cached = cache.get_many(list(keys))
+        return dict((keys[key], value['state'])
+                    for key, value in cached.items())
+
+    def schedule_fetch(self):
+        """Returns whether no other fetch has been scheduled recently.
+
+        A failed fetch isn't tried again before
+        ``YOUTRACK_ISSUE_STATE_FETCH_INTERVAL`` seconds pass.
+        """
+        return cache.add('%s:fetch' % self.key, 1, STATE_FETCH_INTERVAL)
+
+    def fetch(self, client, issue_ids):
+        """Fetches and caches the states of the issues in batches of
+        ``YOUTRACK_ISSUE_STATE_BATCH_SIZE``."""
+        issue_ids = list(issue_ids)
+        if not issue_ids:
+            return {}
+        states = dict.fromkeys(issue_ids)
+        for issue in client.get_issues(self.project_id, issue_ids,
+                                       STATE_BATCH_SIZE):
+            states[issue['id']] = issue['state']
+        cache.set_many(dict((self._get_key(issue_id), {'state': state})
+                            for issue_id, state in states.items()),
+                       STATE_CACHE_TIMEOUT)
+        return states
+
+    def invalidate(self, issue_ids):
+        cache.delete_many([self._get_key(issue_id) for issue_id in issue_ids])
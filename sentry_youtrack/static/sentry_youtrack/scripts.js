@@ -48,20 +48,109 @@ function init_action_buttons(container) {
     $('button[title]').tooltip();
 }
 
+function init_remote_choices(container) {
+    container.find("input.remote-choice").each(function(){
+        var input = $(this);
+        var multiple = input.data('multiple') == 1;
+
+        function to_choice(value) {
+            return {id: value, text: value};
+        }
+
+        input.addClass('span3').select2({
+            multiple: multiple,
+            allowClear: true,
+            placeholder: "-----",
+            minimumInputLength: 0,
+            ajax: {
+                url: "?action=field_values",
+                quietMillis: 100,
+                dataType: 'json',
+                data: function (term, page) {
+                    return {
+                        field: input.data('field'),
+                        q: term,
+                        page_limit: 30,
+                        page: page
+                    };
+                },
+                results: function (data, page) {
+                    return {results: $.map(data.values, to_choice), more: data.more};
+                }
+            },
+            initSelection: function (element, callback) {
+                var values = $.grep(element.val().split(','), function (value) {
+                    return value;
+                });
+                var choices = $.map(values, to_choice);
+                callback(multiple ? choices : choices[0]);
+            }
+        });
+    });
+}
+
+function render_field(field) {
+    var value = field.value === null ? '' : field.value;
+    var label = $('<label>')
+            .attr('for', field.id)
+            .addClass('control-label')
+            .text(field.label);
+    var input;
+
+    if (field.required) {
+        label.addClass('requiredField')
+            .append($('<span>').addClass('asteriskField').text('*'));
+    }
+    if (field.widget == 'select') {
+        var selected = $.map($.isArray(value) ? value : [value], String);
+        input = $('<select>').prop('multiple', field.multiple);
+        $.each(field.choices, function(i, choice){
+            $('<option>')
+                .val(choice[0])
+                .text(choice[1])
+                .prop('selected', $.inArray(choice[0], selected) != -1)
+                .appendTo(input);
+        });
+    } else if (field.widget == 'textarea') {
+        input = $('<textarea>').attr('rows', 10).val(value);
+    } else {
+        input = $('<input>').attr('type', 'text')
+            .val($.isArray(value) ? value.join(',') : value);
+    }
+    input.attr(field.attrs).attr({id: field.id, name: field.name});
+
+    var controls = $('<div>').addClass('controls').append(input);
+    if (field.help_text) {
+        controls.append($('<p>').addClass('help-block').text(field.help_text));
+    }
+    return $('<div>')
+        .attr('id', 'div_' + field.id)
+        .addClass('control-group')
+        .append(label, controls);
+}
+
 function load_issue_form() {
     var spinner = new Spinner().spin();
 
     $.ajax({
-        'url': "?form=1",
+        'url': "?action=form_schema",
+        'dataType': 'json',
         beforeSend: function( xhr ) {
             $(".form-fields").html(spinner.el);
             $(".spinner").css('left', '50%');
         }
     }).done(function(data){
-        var container = $(".form-fields");
-        var form = $("#create-issue .form-fields", data);
-        container.html(form);
+        var container = $(".form-fields").empty();
+        if (data.error) {
+            container.append($('<div>')
+                .addClass('alert alert-block alert-warning')
+                .text(data.error));
+        }
+        $.each(data.fields, function(i, field){
+            container.append(render_field(field));
+        });
         container.find("select").addClass('span3').select2();
+        init_remote_choices(container);
         init_action_buttons(container);
     });
 }
@@ -74,12 +163,15 @@ $(function(){
         save_as_default($(this), field.data('field'), String(field.val()));
     });
 
+    init_remote_choices(container);
     init_action_buttons(container);
 
     function format(state) {
         return "<b>" + state.id +"</b> " + state.summary + " (" + state.state + ")"
     }
 
+    var issues_error = null;
+
     $("#id_issue").select2({
         minimumInputLength: 0,
         ajax: {
@@ -95,9 +187,13 @@ $(function(){
                 };
             },
             results: function (data, page) {
+                issues_error = data.error || null;
                 return {results: data.issues, more: data.more};
             }
         },
+        formatNoMatches: function (term) {
+            return issues_error || "No matches found";
+        },
         formatResult: format,
         formatSelection: format
     });
@@ -0,0 +1,150 @@
+import json
+import logging
+import random
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from sentry.models import (Group, GroupMeta, Project, ProjectOption,
+                           ProjectStatus)
+from sentry.plugins import plugins
+from sentry.tasks.base import instrumented_task
+from sentry.utils.cache import cache
+
+from .outbox import PENDING
+
+
+logger = logging.getLogger(__name__)
+
+WARM_FIELDS_INTERVAL = getattr(
+    settings, 'YOUTRACK_WARM_FIELDS_INTERVAL', 300)
+WARM_FIELDS_JITTER = getattr(settings, 'YOUTRACK_WARM_FIELDS_JITTER', 60)
+WARM_FIELDS_ACTIVITY_PERIOD = getattr(
+    settings, 'YOUTRACK_WARM_FIELDS_ACTIVITY_PERIOD', 60 * 60 * 24)
+OUTBOX_LOCK_TIMEOUT = 5 * 60
+# tasks of records which are overdue by that many seconds were lost
+OUTBOX_SWEEP_DELAY = getattr(settings, 'YOUTRACK_OUTBOX_SWEEP_DELAY', 10 * 60)
+
+
+def get_plugin():
+    return plugins.get('youtrack')
+
+
+def get_configured_projects(plugin):
+    option_key = '%s:project' % plugin.get_conf_key()
+    project_ids = (ProjectOption.objects.filter(key=option_key)
+                   .values_list('project_id', flat=True))
+    projects = Project.objects.filter(
+        id__in=list(project_ids), status=ProjectStatus.VISIBLE)
+    for project in projects:
+        if (plugin.is_enabled(project) and
+                plugin.is_configured(None, project)):
+            yield project
+
+
+@instrumented_task(name='sentry_youtrack.tasks.warm_project_fields')
+def warm_project_fields(**kwargs):
+    """Schedules refreshing of the cached fields of active projects.
+
+    Meant to run every ``YOUTRACK_WARM_FIELDS_INTERVAL`` seconds. Refreshes
+    are spread over ``YOUTRACK_WARM_FIELDS_JITTER`` seconds so they don't
+    hit YouTrack all at once.
+    """
+    plugin = get_plugin()
+    last_seen = timezone.now() - timedelta(
+        seconds=WARM_FIELDS_ACTIVITY_PERIOD)
+    for project in get_configured_projects(plugin):
+        if not Group.objects.filter(
+                project=project, last_seen__gte=last_seen).exists():
+            continue
+        warm_project_fields_for_project.apply_async(
+            kwargs={'project_id': project.id},
+            countdown=random.randint(0, WARM_FIELDS_JITTER))
+
+
+@instrumented_task(
+    name='sentry_youtrack.tasks.warm_project_fields_for_project')
+def warm_project_fields_for_project(project_id, **kwargs):
+    try:
+        project = Project.objects.get_from_cache(id=project_id)
+    except Project.DoesNotExist:
+        return
+    # refresh the fields if they would expire before the next run
+    refresh_within = WARM_FIELDS_INTERVAL + WARM_FIELDS_JITTER
+    try:
+        get_plugin().get_project_fields(
+            project, refresh_within=refresh_within)
+    except Exception:
+        logger.warning('Unable to refresh YouTrack fields of project %s',
+                       project_id, exc_info=True)
+
+
+@instrumented_task(name='sentry_youtrack.tasks.sync_issue_index')
+def sync_issue_index(project_id, **kwargs):
+    try:
+        project = Project.objects.get_from_cache(id=project_id)
+    except Project.DoesNotExist:
+        return
+    get_plugin().sync_issue_index(project)
+
+
+@instrumented_task(name='sentry_youtrack.tasks.fetch_issue_states')
+def fetch_issue_states(project_id, issue_ids=(), **kwargs):
+    try:
+        project = Project.objects.get_from_cache(id=project_id)
+    except Project.DoesNotExist:
+        return
+    try:
+        get_plugin().fetch_issue_states(project, issue_ids)
+    except Exception:
+        logger.warning('Unable to fetch states of YouTrack issues of '
+                       'project %s', project_id, exc_info=True)
+
+
+@instrumented_task(name='sentry_youtrack.tasks.create_outbox_issue')
+def create_outbox_issue(group_id, **kwargs):
+    """Runs the remaining steps of the issue in the outbox of the group.
+
+    Failed steps are retried with backoff. The group is linked to the
+    issue when all of them are done.
+    """
+    try:
+        group = Group.objects.get_from_cache(id=group_id)
+    except Group.DoesNotExist:
+        return
+    plugin = get_plugin()
+    outbox = plugin.get_outbox(group)
+    lock_key = 'youtrack:outbox:%s:lock' % group_id
+    if not cache.add(lock_key, 1, OUTBOX_LOCK_TIMEOUT):
+        return
+    try:
+        if not outbox.load() or not outbox.is_pending():
+            return
+        try:
+            yt_client = plugin.get_youtrack_client(group.project)
+            issue_id = outbox.process(yt_client)
+        except Exception as e:
+            delay = outbox.retry(e)
+            logger.warning('Unable to create YouTrack issue of group %s '
+                           '(attempt %s)', group_id,
+                           outbox.record['attempts'], exc_info=True)
+            if delay is not None:
+                create_outbox_issue.apply_async(
+                    kwargs={'group_id': group_id}, countdown=delay)
+            return
+        plugin.link_outbox_issue(group, outbox, issue_id)
+    finally:
+        cache.delete(lock_key)
+
+
+@instrumented_task(name='sentry_youtrack.tasks.sweep_issue_outbox')
+def sweep_issue_outbox(**kwargs):
+    """Schedules again the outbox records whose tasks were lost."""
+    overdue = time.time() - OUTBOX_SWEEP_DELAY
+    key = '%s:outbox' % get_plugin().get_conf_key()
+    for group_id, value in (GroupMeta.objects.filter(key=key)
+                            .values_list('group_id', 'value')):
+        record = json.loads(value)
+        if record['status'] == PENDING and record['retry_at'] < overdue:
+            create_outbox_issue.delay(group_id=group_id)
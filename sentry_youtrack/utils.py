@@ -1,20 +1,132 @@
+import json
+import logging
+import time
+from functools import wraps
 from hashlib import md5
 
 from sentry.utils.cache import cache
 
+from .metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+def _canonical(value):
+    if isinstance(value, dict):
+        return sorted((_canonical(k), _canonical(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = [_canonical(item) for item in value]
+        return sorted(items, key=lambda item: json.dumps(item, default=repr))
+    return value
+
+
+def get_cache_key(*args, **kwargs):
+    """Returns the same key for equal arguments.
+
+    Positional arguments keep their order, but the order of keyword
+    arguments and of items in lists, tuples and sets given as arguments
+    doesn't matter.
+    """
+    params = json.dumps([[_canonical(arg) for arg in args],
+                         _canonical(kwargs)], default=repr)
+    return md5(params.encode('utf-8')).hexdigest()
+
+
+def cache_this(timeout=60, stale_timeout=None, lock_timeout=30):
+    """Caches results of the decorated function for ``timeout`` seconds.
+
+    Every result is cached, including ``None`` and empty lists. When many
+    callers miss the cache at once, only one of them calls the function
+    and the rest wait for its result. Expired results are kept for another
+    ``stale_timeout`` seconds (``timeout`` by default) and returned while
+    one caller refreshes them, or when refreshing fails. Hits, misses and
+    stale results are counted in the ``youtrack.cache`` metric.
+    """
+    if stale_timeout is None:
+        stale_timeout = timeout
 
-def cache_this(timeout=60):
     def decorator(func):
+        def count(result):
+            metrics.incr('youtrack.cache',
+                         tags={'name': func.__name__, 'result': result})
+
+        def acquire(key):
+            return cache.add('%s:lock' % key, 1, lock_timeout)
+
+        def release(key):
+            cache.delete('%s:lock' % key)
+
+        def refresh(key, args, kwargs):
+            result = func(*args, **kwargs)
+            cache.set(key, (time.time() + timeout, result),
+                      timeout + stale_timeout)
+            return result
+
+        @wraps(func)
         def wrapper(*args, **kwargs):
-            def get_cache_key(*args, **kwargs):
-                params = list(args) + kwargs.values()
-                return md5("".join(map(str, params))).hexdigest()
             key = get_cache_key(func.__name__, *args, **kwargs)
-            result = cache.get(key)
-            if not result:
-                result = func(*args, **kwargs)
-                cache.set(key, result, timeout)
-            return result
+            entry = cache.get(key)
+            if entry is not None:
+                fresh_until, result = entry
+                if fresh_until > time.time():
+                    count('hit')
+                    return result
+                if not acquire(key):
+                    count('stale')
+                    return result
+                count('refresh')
+                try:
+                    return refresh(key, args, kwargs)
+                except Exception:
+                    logger.warning('Unable to refresh %s, returning stale '
+                                   'result', func.__name__, exc_info=True)
+                    count('stale')
+                    return result
+                finally:
+                    release(key)
+
+            count('miss')
+            deadline = time.time() + lock_timeout
+            while not acquire(key):
+                if time.time() > deadline:
+                    return func(*args, **kwargs)
+                time.sleep(0.1)
+                entry = cache.get(key)
+                if entry is not None:
+                    return entry[1]
+            try:
+                # the lock may have been released just after a refresh
+                entry = cache.get(key)
+                if entry is not None:
+                    return entry[1]
+                return refresh(key, args, kwargs)
+            finally:
+                release(key)
+
+        def force_refresh(*args, **kwargs):
+            """Calls the function again unless another caller already is."""
+            key = get_cache_key(func.__name__, *args, **kwargs)
+            entry = cache.get(key)
+            if not acquire(key):
+                return wrapper(*args, **kwargs)
+            try:
+                current = cache.get(key)
+                if current is not None and current != entry:
+                    # another caller has refreshed it in the meantime
+                    return current[1]
+                return refresh(key, args, kwargs)
+            finally:
+                release(key)
+
+        def ttl(*args, **kwargs):
+            """Returns the number of seconds until the result expires."""
+            entry = cache.get(get_cache_key(func.__name__, *args, **kwargs))
+            if entry is not None:
+                return entry[0] - time.time()
+
+        wrapper.refresh = force_refresh
+        wrapper.ttl = ttl
         return wrapper
     return decorator
 
@@ -1,24 +1,387 @@
-import requests
+import atexit
+import copy
+import hashlib
 import logging
-from bs4 import BeautifulSoup
+import random
+import re
+import threading
+import time
+import types
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from cookielib import DefaultCookiePolicy
+except ImportError:
+    from http.cookiejar import DefaultCookiePolicy
 
 from sentry_youtrack import VERSION
+from sentry_youtrack.parsers import ElementTree, IterParser
 
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = (5, 30)
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+# metric labels of the api urls, the first matching one is used
+ENDPOINTS = [(name, re.compile(pattern)) for name, pattern in (
+    ('login', r'^/rest/user/login$'),
+    ('project_field', r'^/rest/admin/project/[^/]+/customfield/'),
+    ('project_fields', r'^/rest/admin/project/[^/]+/customfield$'),
+    ('project', r'^/rest/admin/project/[^/]+$'),
+    ('projects', r'^/rest/project/all$'),
+    ('bundle_values', r'^/rest/admin/customfield/'),
+    ('group_users', r'^/rest/admin/user$'),
+    ('user', r'^/rest/admin/user/'),
+    ('issue_search', r'^/rest/issue/byproject/'),
+    ('command', r'^/rest/issue/[^/]+/execute$'),
+    ('create', r'^/rest/issue$'))]
+
+
+class NullMetrics(object):
+    """Metrics backend which drops everything."""
+
+    def timing(self, key, value, tags=None):
+        pass
+
+    def incr(self, key, amount=1, tags=None):
+        pass
+
+
+null_metrics = NullMetrics()
+
+
+class CircuitOpenError(requests.ConnectionError):
+    pass
+
+
+class CircuitBreaker(object):
+    """Fails requests to an instance fast while it seems to be down.
+
+    The circuit opens after ``failure_threshold`` consecutive connection
+    errors, timeouts or 5xx responses. After ``reset_timeout`` seconds one
+    request is let through, and the circuit closes when it succeeds.
+    """
+
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def is_open(self):
+        return self.opened_at is not None
+
+    def before_request(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if self.opened_at + self.reset_timeout > time.time():
+                raise CircuitOpenError(
+                    'YouTrack is unavailable, retrying in %d seconds' % (
+                        self.opened_at + self.reset_timeout - time.time()))
+            # let this request through and fail the others until it's done
+            self.opened_at = time.time()
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning('YouTrack is unavailable, failing '
+                                   'requests for %s seconds',
+                                   self.reset_timeout)
+                self.opened_at = time.time()
+
 
 class Session(requests.Session):
 
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE,
+                 failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT):
+        super(Session, self).__init__()
+        # limits concurrent requests to the host to the size of the pool
+        self.limit = threading.BoundedSemaphore(pool_size)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        # The session is shared by clients logged in as different users, so
+        # it must not keep cookies - every client sends its own.
+        self.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+
     def request(self, method, url, **kwargs):
         logger.debug('%s: %s' % (method, url))
         return super(Session, self).request(method, url, **kwargs)
 
 
+def get_session(url, pool_size=DEFAULT_POOL_SIZE,
+                failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                reset_timeout=DEFAULT_RESET_TIMEOUT):
+    """Returns the keep-alive session shared by all clients of ``url``.
+
+    The other arguments are only used when the session is created.
+    """
+    with _sessions_lock:
+        session = _sessions.get(url)
+        if session is None:
+            session = _sessions[url] = Session(
+                pool_size, failure_threshold, reset_timeout)
+        return session
+
+
+def close_sessions():
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
+
+
+atexit.register(close_sessions)
+
+
+class TimedCache(object):
+    """Process-wide cache of values which expire at a given time."""
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value, expires = self._values.get(key, (None, 0))
+        if expires > time.time():
+            return value
+
+    def set(self, key, value, expires):
+        with self._lock:
+            self._values[key] = (value, expires)
+
+    def delete(self, key, value=None):
+        with self._lock:
+            cached_value, _ = self._values.get(key, (None, 0))
+            # don't drop a value that another client has just refreshed
+            if value is None or cached_value == value:
+                self._values.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class TokenCache(TimedCache):
+    """Cache of the API keys returned by YouTrack logins."""
+
+    def get_key(self, url, username, password):
+        password = password or u''
+        if not isinstance(password, bytes):
+            password = password.encode('utf-8')
+        return url, username, hashlib.sha256(password).hexdigest()
+
+
+token_cache = TokenCache()
+group_cache = TimedCache()
+
+
+class ConditionalCache(object):
+    """Process-wide store of validators and parsed results of GET requests.
+
+    Keeps up to ``max_size`` of the most recently used responses.
+    """
+
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._entries[key] = entry
+            return entry
+
+    def set(self, key, etag, last_modified, result):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (etag, last_modified, result)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+conditional_cache = ConditionalCache()
+
+
+class _Call(object):
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.waiters = 0
+        self.result = None
+        self.error = None
+
+
+class RequestCoalescer(object):
+    """Lets concurrent callers of the same request share a single one.
+
+    The first caller makes the request, the others wait for it and get
+    copies of its result, or its exception.
+    """
+
+    def __init__(self):
+        self.executed = 0
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def call(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                waiters = call.waiters
+            call.event.set()
+        # the waiters copy the result, so the caller mustn't get the original
+        return copy.deepcopy(call.result) if waiters else call.result
+
+    def clear(self):
+        with self._lock:
+            self.executed = self.coalesced = 0
+
+
+request_coalescer = RequestCoalescer()
+
+
 class YouTrackError(Exception):
     pass
 
 
+class YouTrackCommandError(YouTrackError):
+
+    def __init__(self, issue, errors):
+        self.issue = issue
+        self.errors = errors
+        message = u'; '.join(u'"%s": %s' % error for error in errors)
+        super(YouTrackCommandError, self).__init__(
+            u'Unable to apply commands to %s: %s' % (issue, message))
+
+
+class IssueIterator(object):
+    """Iterates over all issues of a project which match the query.
+
+    Issues are fetched ``page_size`` at a time. With ``prefetch`` the next
+    page is requested in the background while the current one is consumed,
+    so no more than two pages are kept in memory. ``checkpoint`` is the
+    number of issues returned so far; an iterator created with it resumes
+    after them.
+    """
+
+    def __init__(self, client, project_id, query=None, updated_after=None,
+                 page_size=100, checkpoint=0, prefetch=True):
+        self.client = client
+        self.project_id = project_id
+        self.query = query
+        self.updated_after = updated_after
+        self.page_size = page_size
+        self.checkpoint = checkpoint
+        self.prefetch = prefetch
+
+    def _get_page(self, offset):
+        return self.client.get_project_issues(
+            self.project_id, query=self.query, offset=offset,
+            limit=self.page_size, updated_after=self.updated_after)
+
+    def _prefetch(self, offset):
+        call = _Call()
+
+        def run():
+            try:
+                call.result = self._get_page(offset)
+            except Exception as e:
+                call.error = e
+            finally:
+                call.event.set()
+        # a thread of its own, shutting down a pool takes longer than
+        # fetching a small page
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        return call
+
+    def __iter__(self):
+        offset = self.checkpoint
+        page = self._get_page(offset)
+        while page:
+            offset += len(page)
+            last_page = len(page) < self.page_size
+            next_page = None
+            if self.prefetch and not last_page:
+                next_page = self._prefetch(offset)
+            for issue in page:
+                self.checkpoint += 1
+                yield issue
+            if last_page:
+                break
+            if next_page is None:
+                page = self._get_page(offset)
+                continue
+            next_page.event.wait()
+            if next_page.error is not None:
+                raise next_page.error
+            page = next_page.result
+
+
 class YouTrackClient(object):
 
     LOGIN_URL = '/rest/user/login'
@@ -32,13 +395,34 @@ class YouTrackClient(object):
     USER_URL = '/rest/admin/user/<user>'
 
     API_KEY_COOKIE_NAME = 'jetbrains.charisma.main.security.PRINCIPAL'
+    # used when YouTrack doesn't set the expiration date of the cookie
+    API_KEY_TIMEOUT = 3600
+    RETRY_STATUS_CODES = (502, 503, 504)
 
     def __init__(self, url, username=None, password=None, api_key=None,
-                 verify_ssl_certificate=True):
+                 verify_ssl_certificate=True, pool_size=DEFAULT_POOL_SIZE,
+                 timeout=DEFAULT_TIMEOUT, max_workers=1, parser=None,
+                 group_cache_timeout=300, retries=0, retry_backoff=0.5,
+                 failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT, metrics=None):
         self.verify_ssl_certificate = verify_ssl_certificate
+        self.metrics = metrics or null_metrics
+        self.group_cache_timeout = group_cache_timeout
+        self.parser = parser or IterParser()
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.retries = retries
+        self.retry_backoff = retry_backoff
         self.url = url.rstrip('/') if url else ''
+        self.session = get_session(self.url, pool_size, failure_threshold,
+                                   reset_timeout)
+        self.username = username
+        self.password = password
+        self.token_key = None
         if api_key is None:
-            self.api_key = self._login(username, password)
+            self.token_key = token_cache.get_key(self.url, username, password)
+            self.api_key = (token_cache.get(self.token_key) or
+                            self._login(username, password))
         else:
             self.api_key = api_key
         self.cookies = {self.API_KEY_COOKIE_NAME: self.api_key}
@@ -49,48 +433,201 @@ class YouTrackClient(object):
             'password': password}
         url = self.url + self.LOGIN_URL
         response = self.request(url, data=credentials, method='post')
-        if BeautifulSoup(response.text, 'xml').login is None:
+        if not self.parser.is_login(response.content):
             raise requests.HTTPError('Invalid YouTrack url')
-        return response.cookies.get(self.API_KEY_COOKIE_NAME)
-
-    def _get_bundle(self, response, bundle='enumeration'):
-        soup = BeautifulSoup(response.text, 'xml')
-        if soup.find('error'):
-            raise YouTrackError(soup.find('error').string)
-
-        bundle_method = '_get_%s_values' % bundle.lower()
-        if hasattr(self, bundle_method):
-            return getattr(self, bundle_method)(soup)
+        api_key = response.cookies.get(self.API_KEY_COOKIE_NAME)
+        if self.token_key is not None:
+            expires = None
+            for cookie in response.cookies:
+                if cookie.name == self.API_KEY_COOKIE_NAME:
+                    expires = cookie.expires
+            expires = expires or time.time() + self.API_KEY_TIMEOUT
+            token_cache.set(self.token_key, api_key, expires)
+        return api_key
+
+    def _relogin(self):
+        token_cache.delete(self.token_key, self.api_key)
+        self.api_key = self._login(self.username, self.password)
+        self.cookies = {self.API_KEY_COOKIE_NAME: self.api_key}
 
-        return [item.text for item in getattr(soup, bundle)]
+    def _can_relogin(self, url):
+        return (self.token_key is not None and hasattr(self, 'cookies') and
+                url != self.url + self.LOGIN_URL)
+
+    def _map(self, func, items):
+        """Like ``map``, but calls ``func`` on up to ``max_workers`` threads.
+
+        Results are yielded in the order of ``items`` and an exception is
+        raised when the failed item is reached, as in the sequential version.
+        """
+        items = list(items)
+        if self.max_workers <= 1 or len(items) <= 1:
+            for item in items:
+                yield func(item)
+            return
+        pool = ThreadPool(min(self.max_workers, len(items)))
+        try:
+            for result in pool.imap(func, items):
+                yield result
+        finally:
+            pool.terminate()
+
+    def _get_endpoint(self, url):
+        path = url[len(self.url):] if url.startswith(self.url) else url
+        for name, pattern in ENDPOINTS:
+            if pattern.match(path):
+                return name
+        return 'other'
+
+    def _send(self, method, kwargs):
+        breaker = self.session.breaker
+        tags = {'endpoint': self._get_endpoint(kwargs['url'])}
+        start = time.time()
+        try:
+            breaker.before_request()
+            with self.session.limit:
+                response = self.session.request(method, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if not isinstance(e, CircuitOpenError):
+                breaker.failure()
+            tags['error'] = type(e).__name__
+            self.metrics.incr('youtrack.request.error', tags=tags)
+            raise
+        if response.status_code >= 500:
+            breaker.failure()
+        else:
+            breaker.success()
+        tags['status'] = response.status_code
+        self.metrics.timing('youtrack.request.duration',
+                            time.time() - start, tags=tags)
+        self.metrics.timing('youtrack.response.size',
+                            len(response.content), tags=tags)
+        return response
 
-    def _get_userbundle_values(self, soup):
-        def get_user_logins(xml):
-            return [item['login'] for item in xml.findAll('user')]
-        users = set(get_user_logins(soup.userBundle))
-        for group in soup.userBundle.findAll('userGroup'):
-            users.update(
-                get_user_logins(self._get_users_from_group(group['name'])))
+    def _parse(self, url, parse, content):
+        start = time.time()
+        result = parse(content)
+        if isinstance(result, types.GeneratorType):
+            result = list(result)
+        self.metrics.timing('youtrack.parse.duration', time.time() - start,
+                            tags={'endpoint': self._get_endpoint(url)})
+        return result
+
+    def _send_with_retries(self, method, kwargs):
+        """Sends GETs again after connection errors, timeouts and
+        502-504 responses, up to ``retries`` times.
+
+        Retries wait a random time up to ``retry_backoff`` seconds, doubled
+        after each retry. Nothing is retried while the circuit is open.
+        """
+        retries = self.retries if method == 'get' else 0
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(random.uniform(
+                    0, self.retry_backoff * 2 ** (attempt - 1)))
+            try:
+                response = self._send(method, kwargs)
+            except CircuitOpenError:
+                raise
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == retries or self.session.breaker.is_open():
+                    raise
+                continue
+            if (response.status_code not in self.RETRY_STATUS_CODES or
+                    attempt == retries or self.session.breaker.is_open()):
+                return response
+
+    def _get(self, url, parse, params=None, conditional=False):
+        """Returns ``parse(content)`` of the response to a GET of ``url``.
+
+        Concurrent calls for the same url, params and user share one
+        request. With ``conditional`` the result is kept with the ETag and
+        Last-Modified headers of the response. Next requests send them
+        back, and when YouTrack answers 304 Not Modified the kept result is
+        returned.
+        """
+        key = (self.token_key or self.api_key, url,
+               tuple(sorted((params or {}).items())))
+        if conditional:
+            get = self._get_conditional
+        else:
+            get = self._get_parsed
+        return request_coalescer.call(
+            key, lambda: get(key, url, parse, params))
+
+    def _get_parsed(self, key, url, parse, params):
+        response = self.request(url, params=params)
+        return self._parse(url, parse, response.content)
+
+    def _get_conditional(self, key, url, parse, params):
+        entry = conditional_cache.get(key)
+        headers = {}
+        if entry is not None:
+            etag, last_modified, result = entry
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        response = self.request(url, params=params, headers=headers)
+        if response.status_code == 304 and entry is not None:
+            conditional_cache.record(hit=True)
+            return copy.deepcopy(result)
+        conditional_cache.record(hit=False)
+
+        result = self._parse(url, parse, response.content)
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag or last_modified:
+            conditional_cache.set(key, etag, last_modified,
+                                  copy.deepcopy(result))
+        return result
+
+    def _get_bundle(self, content, bundle='enumeration'):
+        error = self.parser.get_error(content)
+        if error is not None:
+            raise YouTrackError(error)
+        if bundle == 'userBundle':
+            return self.parser.get_user_bundle(content)
+        return self.parser.get_bundle_values(content, bundle)
+
+    def _get_userbundle_values(self, bundle):
+        logins, groups = bundle
+        users = set(logins)
+        for group_logins in self._map(self._get_users_from_group, groups):
+            users.update(group_logins)
         return sorted(users)
 
     def _get_users_from_group(self, group):
-        url = self.url + self.USER_URL.replace('/<user>', '')
-        response = self.request(url, method='get', params={'group': group})
-        return BeautifulSoup(response.text, 'xml').userRefs
+        """Returns logins of the group's members, cached for the instance."""
+        key = (self.url, group)
+        logins = group_cache.get(key)
+        if logins is None:
+            url = self.url + self.USER_URL.replace('/<user>', '')
+            logins = self._get(url, self.parser.get_user_logins,
+                               params={'group': group}, conditional=True)
+            expires = time.time() + self.group_cache_timeout
+            group_cache.set(key, logins, expires)
+        return logins
 
     def _get_custom_field_values(self, name, value, bundle='enumeration'):
         url = self.url + (self.CUSTOM_FIELD_VALUES
                           .replace("<param_name>", name)
                           .replace('<param_value>', value))
-        response = self.request(url, method='get')
-        return self._get_bundle(response, bundle)
+        values = self._get(
+            url, lambda content: self._get_bundle(content, bundle),
+            conditional=True)
 
-    def _get_custom_project_field_details(self, field):
+        bundle_method = '_get_%s_values' % bundle.lower()
+        if hasattr(self, bundle_method):
+            return getattr(self, bundle_method)(values)
+        return values
+
+    def _get_custom_project_field(self, field):
         url = field['url']
         url = '%s%s' % (self.url, url[url.index('/rest/admin/'):])
-        response = self.request(url, method='get')
-        field_data = BeautifulSoup(response.text, 'xml')
-        field_type = field_data.projectCustomField['type']
+        field_data = self._get(url, self.parser.get_project_field,
+                               conditional=True)
+        field_type = field_data['type']
         type_prefix = field_type[:field_type.find('[')]
 
         type_name = "%sBundle" % type_prefix
@@ -105,22 +642,28 @@ class YouTrackClient(object):
             'version': 'versions',
             'build': 'buildBundle'}
 
-        values = None
-        if field_data.param:
-            kwargs = {
+        bundle = None
+        if field_data['param']:
+            bundle = {
                 'name': type_name,
-                'value': field_data.param['value'],
+                'value': field_data['param'],
                 'bundle': bundles.get(type_prefix)}
-            values = self._get_custom_field_values(**kwargs)
 
-        field_details = {
-            'name': field_data.projectCustomField['name'],
-            'type': field_data.projectCustomField['type'],
-            'empty_text': field_data.projectCustomField['emptyText'],
-            'values': values}
+        return {
+            'name': field_data['name'],
+            'type': field_data['type'],
+            'empty_text': field_data['empty_text'],
+            'bundle': bundle}
+
+    def _get_custom_project_field_details(self, field):
+        field_details = self._get_custom_project_field(field)
+        bundle = field_details.pop('bundle')
+        field_details['values'] = (
+            self.get_bundle_values(bundle) if bundle else None)
         return field_details
 
-    def request(self, url, data=None, params=None, method='get'):
+    def request(self, url, data=None, params=None, method='get',
+                timeout=None, headers=None):
         if method not in ['get', 'post']:
             raise AttributeError("Invalid method %s" % method)
 
@@ -129,35 +672,37 @@ class YouTrackClient(object):
             'data': data,
             'params': params,
             'verify': self.verify_ssl_certificate,
+            'timeout': timeout or self.timeout,
             'headers': {
                 'User-Agent': 'sentry-youtrack/%s' % VERSION}}
+        if headers:
+            kwargs['headers'].update(headers)
 
         if hasattr(self, 'cookies'):
             kwargs['cookies'] = self.cookies
 
-        session = Session()
-        if method == 'get':
-            response = session.get(**kwargs)
-        else:
-            response = session.post(**kwargs)
+        response = self._send_with_retries(method, kwargs)
+        if response.status_code in (401, 403) and self._can_relogin(url):
+            # the cached api key has expired, log in again and retry once
+            self._relogin()
+            kwargs['cookies'] = self.cookies
+            response = self._send_with_retries(method, kwargs)
         response.raise_for_status()
         return response
 
     def get_project_name(self, project_id):
         url = self.url + self.PROJECT_URL.replace('<project_id>', project_id)
-        response = self.request(url, method='get')
-        return BeautifulSoup(response.text, 'xml').project['name']
+        return self._get(url, self.parser.get_project_name)
 
     def get_user(self, username):
         url = self.url + self.USER_URL.replace('<user>', username)
-        response = self.request(url, method='get')
-        return BeautifulSoup(response.text, 'xml').user
+        return self._get(url, self.parser.get_user)
 
     def get_projects(self):
         url = self.url + self.PROJECTS_URL
-        response = self.request(url, method='get')
-        for project in BeautifulSoup(response.text, 'xml').projects:
-            yield {'id': project['shortName'], 'name': project['name']}
+        for project in self._get(url, self.parser.get_projects,
+                                 conditional=True):
+            yield project
 
     def get_priorities(self):
         return self._get_custom_field_values('bundle', 'Priorities')
@@ -165,40 +710,201 @@ class YouTrackClient(object):
     def get_issue_types(self):
         return self._get_custom_field_values('bundle', 'Types')
 
-    def get_project_issues(self, project_id, query=None, offset=0, limit=15):
+    def get_project_issues(self, project_id, query=None, offset=0, limit=15,
+                           updated_after=None):
         url = self.url + self.ISSUES_URL.replace('<project_id>', project_id)
-        params = {'max': limit, 'after': offset, 'filter': query}
-        response = self.request(url, method='get', params=params)
-        issues = [
-            {'id': issue['id'],
-             'state': issue.find("field", {'name': 'State'}).value.text,
-             'summary': issue.find("field", {'name': 'summary'}).text}
-            for issue in BeautifulSoup(response.text, 'xml').issues]
+        params = {'max': limit, 'after': offset, 'filter': query,
+                  'updatedAfter': updated_after}
+        return self._get(url, self.parser.get_issues, params)
+
+    def get_issues(self, project_id, issue_ids, batch_size=50):
+        """Returns the issues of the project with the given ids.
+
+        Every ``batch_size`` ids are searched for with one request, on up to
+        ``max_workers`` threads. Missing issues are left out.
+        """
+        issue_ids = list(issue_ids)
+        batches = [issue_ids[i:i + batch_size]
+                   for i in range(0, len(issue_ids), batch_size)]
+
+        def get_batch(batch):
+            query = u'issue id: %s' % u', '.join(batch)
+            return list(self.get_project_issues(project_id, query=query,
+                                                limit=len(batch)))
+        issues = []
+        for batch_issues in self._map(get_batch, batches):
+            issues.extend(batch_issues)
         return issues
 
+    def iter_project_issues(self, project_id, query=None, updated_after=None,
+                            page_size=100, checkpoint=0, prefetch=True):
+        """Returns an ``IssueIterator`` over all issues of the project."""
+        return IssueIterator(self, project_id, query, updated_after,
+                             page_size, checkpoint, prefetch)
+
     def create_issue(self, data):
         url = self.url + self.CREATE_URL
         response = self.request(url, data=data, method='post')
-        return BeautifulSoup(response.text, 'xml').issue['id']
+        return self.parser.get_issue_id(response.content)
 
     def execute_command(self, issue, command):
         url = self.url + self.COMMAND_URL.replace('<issue>', issue)
         data = {'command': command}
         return self.request(url, data=data, method='post')
 
+    def execute_commands(self, issue, commands):
+        """Applies ``commands`` to the issue in a single request.
+
+        When YouTrack rejects the combined command, the commands are
+        executed one by one and ``YouTrackCommandError`` lists the ones
+        that failed.
+        """
+        commands = [command for command in commands if command]
+        if not commands:
+            return
+        try:
+            self.execute_command(issue, u' '.join(commands))
+            return
+        except requests.HTTPError as e:
+            if len(commands) == 1:
+                raise YouTrackCommandError(
+                    issue, [(commands[0], self._get_error_message(e))])
+        errors = []
+        for command in commands:
+            try:
+                self.execute_command(issue, command)
+            except requests.HTTPError as e:
+                errors.append((command, self._get_error_message(e)))
+        if errors:
+            raise YouTrackCommandError(issue, errors)
+
+    def create_issues(self, issues, commands=(), callback=None):
+        """Creates the issues and applies ``commands`` to each of them.
+
+        Issues are created on up to ``max_workers`` threads. Returns a list
+        of ``(issue_id, error)`` pairs in the order of ``issues``. A failed
+        issue has no id, and ``YouTrackCommandError`` means that the issue
+        was created but some of the commands failed. ``callback`` is called
+        with the numbers of finished and all issues after each issue.
+        """
+        issues = list(issues)
+        lock = threading.Lock()
+        finished = [0]
+
+        def create(data):
+            issue_id = error = None
+            try:
+                issue_id = self.create_issue(data)
+                self.execute_commands(issue_id, commands)
+            except Exception as e:
+                error = e
+            if callback is not None:
+                with lock:
+                    finished[0] += 1
+                    callback(finished[0], len(issues))
+            return issue_id, error
+        return list(self._map(create, issues))
+
+    def _get_error_message(self, error):
+        if error.response is not None:
+            try:
+                message = self.parser.get_error(error.response.content)
+            except ElementTree.ParseError:
+                message = None
+            if message is not None:
+                return message
+        return u'%s' % error
+
     def add_tags(self, issue, tags):
-        for tag in tags:
-            cmd = u'add tag %s' % tag
-            self.execute_command(issue, cmd)
+        self.execute_commands(issue, [u'add tag %s' % tag for tag in tags])
 
     def get_project_fields_list(self, project_id):
         url = self.url + self.PROJECT_FIELDS.replace('<project_id>', project_id)
-        response = self.request(url, method='get')
-        for field in BeautifulSoup(response.text, 'xml').projectCustomFieldRefs:
-            yield {'name': field['name'], 'url': field['url']}
+        fields = self._get(url, self.parser.get_project_field_refs,
+                           conditional=True)
+        for field in fields:
+            yield field
 
-    def get_project_fields(self, project_id, ignore_fields=None):
+    def _filter_project_fields(self, project_id, ignore_fields):
         ignore_fields = ignore_fields or []
-        for field in self.get_project_fields_list(project_id):
-            if not field['name'] in ignore_fields:
-                yield self._get_custom_project_field_details(field)
+        return [field for field in self.get_project_fields_list(project_id)
+                if not field['name'] in ignore_fields]
+
+    def get_project_fields(self, project_id, ignore_fields=None):
+        fields = self._filter_project_fields(project_id, ignore_fields)
+        for field in self._map(self._get_custom_project_field_details,
+                               fields):
+            yield field
+
+    def get_project_field_schemas(self, project_id, ignore_fields=None):
+        """Like ``get_project_fields``, but without the values of fields.
+
+        Fields with values have a ``bundle`` instead, which can be passed to
+        ``get_bundle_values`` and is shared by all fields using the bundle.
+        """
+        fields = self._filter_project_fields(project_id, ignore_fields)
+        for field in self._map(self._get_custom_project_field, fields):
+            yield field
+
+    def get_bundle_values(self, bundle):
+        return self._get_custom_field_values(**bundle)
+
+    def get_bundles_values(self, bundles):
+        return list(self._map(self.get_bundle_values, bundles))
+
+
+def _call(method, args, kwargs):
+    result = method(*args, **kwargs)
+    if isinstance(result, types.GeneratorType):
+        result = list(result)
+    return result
+
+
+class AsyncYouTrackClient(object):
+    """Runs ``YouTrackClient`` calls on a bounded pool of threads.
+
+    The methods have the same signatures as in ``YouTrackClient`` but return
+    ``multiprocessing.pool.AsyncResult`` objects. Results of methods which
+    return generators are lists.
+    """
+
+    METHODS = (
+        'get_project_name',
+        'get_user',
+        'get_projects',
+        'get_priorities',
+        'get_issue_types',
+        'get_issues',
+        'get_project_issues',
+        'create_issue',
+        'execute_command',
+        'execute_commands',
+        'add_tags',
+        'get_project_fields_list',
+        'get_project_fields',
+        'get_project_field_schemas',
+        'get_bundle_values',
+        'get_bundles_values')
+
+    def __init__(self, client, concurrency=DEFAULT_POOL_SIZE):
+        self.client = client
+        self.pool = ThreadPool(concurrency)
+
+    def __getattr__(self, name):
+        if name not in self.METHODS:
+            raise AttributeError(name)
+        method = getattr(self.client, name)
+
+        def apply_async(*args, **kwargs):
+            return self.pool.apply_async(_call, (method, args, kwargs))
+        return apply_async
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
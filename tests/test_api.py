@@ -3,7 +3,10 @@ import os
 import pytest
 from vcr import VCR
 
-from sentry_youtrack.youtrack import YouTrackClient
+from sentry_youtrack.youtrack import (AsyncYouTrackClient, YouTrackClient,
+                                      YouTrackCommandError, YouTrackError,
+                                      close_sessions, group_cache,
+                                      token_cache)
 
 
 PROJECT_ID = 'myproject'
@@ -14,6 +17,8 @@ vcr = VCR(path_transformer=VCR.ensure_suffix('.yaml'),
 
 @pytest.fixture
 def youtrack_client():
+    token_cache.clear()
+    group_cache.clear()
     with vcr.use_cassette('youtrack_client.yaml'):
         client = YouTrackClient('https://youtrack.myjetbrains.com',
                                 username='root', password='admin')
@@ -93,3 +98,182 @@ def test_get_project_fields(youtrack_client):
          'empty_text': u'Next Build', 
          'type': u'build[1]'}]
     assert list(youtrack_client.get_project_fields(PROJECT_ID)) == fields
+
+
+def test_reuse_cached_api_key(youtrack_client):
+    with vcr.use_cassette('youtrack_client.yaml') as cassette:
+        client = YouTrackClient('https://youtrack.myjetbrains.com',
+                                username='root', password='admin')
+    assert cassette.play_count == 0
+    assert client.api_key == 'abcd1234'
+
+
+@vcr.use_cassette
+def test_relogin_on_expired_api_key(youtrack_client):
+    assert youtrack_client.get_project_name(PROJECT_ID) == 'My project'
+    assert youtrack_client.api_key == 'efgh5678'
+    assert token_cache.get(youtrack_client.token_key) == 'efgh5678'
+
+
+def test_get_user_bundle_with_groups(youtrack_client):
+    youtrack_client.max_workers = 2
+    bundle = {'name': 'userBundle', 'value': 'Assignees',
+              'bundle': 'userBundle'}
+    with vcr.use_cassette('test_get_user_bundle_with_groups.yaml'):
+        values = youtrack_client.get_bundle_values(bundle)
+    assert values == ['alice', 'bob', 'root']
+
+    with vcr.use_cassette('test_get_user_bundle_with_groups.yaml') as cassette:
+        assert youtrack_client.get_bundle_values(bundle) == values
+    # members of the groups are cached
+    assert cassette.play_count == 1
+
+
+@vcr.use_cassette
+def test_execute_commands_fallback(youtrack_client):
+    commands = ['Priority Critical', 'Type Bugg', 'add tag sentry']
+    with pytest.raises(YouTrackCommandError) as e:
+        youtrack_client.execute_commands('myproject-1', commands)
+    assert e.value.errors == [('Type Bugg', 'Unknown command: Bugg')]
+
+
+def test_create_issues(youtrack_client, monkeypatch):
+    def create_issue(data):
+        if data['summary'] == 'Broken':
+            raise YouTrackError('Invalid summary')
+        return 'myproject-%s' % data['summary']
+
+    def execute_commands(issue, commands):
+        if issue == 'myproject-2':
+            raise YouTrackCommandError(issue, [('Type Bugg', 'Unknown')])
+
+    monkeypatch.setattr(youtrack_client, 'create_issue', create_issue)
+    monkeypatch.setattr(youtrack_client, 'execute_commands', execute_commands)
+    youtrack_client.max_workers = 2
+    progress = []
+    results = youtrack_client.create_issues(
+        [{'summary': '1'}, {'summary': 'Broken'}, {'summary': '2'}],
+        ['Type Bugg'], lambda *args: progress.append(args))
+    assert [(issue_id, type(error)) for issue_id, error in results] == [
+        ('myproject-1', type(None)),
+        (None, YouTrackError),
+        ('myproject-2', YouTrackCommandError)]
+    assert sorted(progress) == [(1, 3), (2, 3), (3, 3)]
+
+
+def test_get_issues(youtrack_client, monkeypatch):
+    queries = []
+
+    def get_project_issues(project_id, query=None, offset=0, limit=15,
+                           updated_after=None):
+        queries.append((query, limit))
+        return [{'id': issue_id} for issue_id in query[10:].split(', ')
+                if issue_id != 'myproject-2']
+
+    monkeypatch.setattr(youtrack_client, 'get_project_issues',
+                        get_project_issues)
+    youtrack_client.max_workers = 2
+    issue_ids = ['myproject-%d' % number for number in range(1, 6)]
+    issues = youtrack_client.get_issues(PROJECT_ID, issue_ids, batch_size=2)
+    assert [issue['id'] for issue in issues] == [
+        'myproject-1', 'myproject-3', 'myproject-4', 'myproject-5']
+    assert sorted(queries) == [
+        ('issue id: myproject-1, myproject-2', 2),
+        ('issue id: myproject-3, myproject-4', 2),
+        ('issue id: myproject-5', 1)]
+
+
+@pytest.mark.parametrize('prefetch', [True, False])
+def test_iter_project_issues(youtrack_client, monkeypatch, prefetch):
+    issues = [{'id': 'myproject-%d' % number} for number in range(7)]
+    calls = []
+
+    def get_project_issues(project_id, query=None, offset=0, limit=15,
+                           updated_after=None):
+        calls.append((offset, limit))
+        return issues[offset:offset + limit]
+
+    monkeypatch.setattr(youtrack_client, 'get_project_issues',
+                        get_project_issues)
+    iterator = youtrack_client.iter_project_issues(
+        PROJECT_ID, page_size=3, prefetch=prefetch)
+    stream = iter(iterator)
+    assert [next(stream) for _ in range(4)] == issues[:4]
+    assert iterator.checkpoint == 4
+    stream.close()
+
+    resumed = youtrack_client.iter_project_issues(
+        PROJECT_ID, page_size=3, checkpoint=iterator.checkpoint,
+        prefetch=prefetch)
+    assert list(resumed) == issues[4:]
+    assert resumed.checkpoint == 7
+    assert (4, 3) in calls and (7, 3) in calls
+
+
+class RecordingMetrics(object):
+
+    def __init__(self):
+        self.timings = []
+        self.counters = []
+
+    def timing(self, key, value, tags=None):
+        self.timings.append((key, tags))
+
+    def incr(self, key, amount=1, tags=None):
+        self.counters.append((key, tags))
+
+
+def test_request_metrics(youtrack_client):
+    youtrack_client.metrics = RecordingMetrics()
+    with vcr.use_cassette('test_get_projects.yaml'):
+        list(youtrack_client.get_projects())
+    tags = {'endpoint': 'projects', 'status': 200}
+    assert youtrack_client.metrics.timings == [
+        ('youtrack.request.duration', tags),
+        ('youtrack.response.size', tags),
+        ('youtrack.parse.duration', {'endpoint': 'projects'})]
+
+
+def test_endpoint_labels(youtrack_client):
+    url = youtrack_client.url
+    assert [youtrack_client._get_endpoint(url + path) for path in (
+        '/rest/user/login',
+        '/rest/admin/project/myproject/customfield',
+        '/rest/admin/project/myproject/customfield/Priority',
+        '/rest/admin/customfield/bundle/Priorities',
+        '/rest/issue/byproject/myproject',
+        '/rest/issue',
+        '/rest/issue/myproject-1/execute')] == [
+        'login', 'project_fields', 'project_field', 'bundle_values',
+        'issue_search', 'create', 'command']
+
+
+def test_clients_share_session(youtrack_client):
+    client = YouTrackClient('https://youtrack.myjetbrains.com/',
+                            api_key='abcd1234')
+    assert client.session is youtrack_client.session
+    assert not client.session.cookies
+
+
+def test_close_sessions(youtrack_client):
+    close_sessions()
+    client = YouTrackClient('https://youtrack.myjetbrains.com',
+                            api_key='abcd1234')
+    assert client.session is not youtrack_client.session
+
+
+def test_get_project_fields_concurrently(youtrack_client):
+    with vcr.use_cassette('test_get_project_fields.yaml'):
+        fields = list(youtrack_client.get_project_fields(PROJECT_ID))
+    youtrack_client.max_workers = 4
+    with vcr.use_cassette('test_get_project_fields.yaml'):
+        assert list(youtrack_client.get_project_fields(PROJECT_ID)) == fields
+
+
+def test_async_client(youtrack_client):
+    with vcr.use_cassette('test_get_projects.yaml'):
+        with AsyncYouTrackClient(youtrack_client) as client:
+            projects = client.get_projects()
+            assert projects.get(timeout=5) == [
+                {'id': 'myproject', 'name': 'My project'},
+                {'id': 'testproject', 'name': 'Test project'}]
@@ -0,0 +1,62 @@
+import threading
+import time
+
+import pytest
+
+from sentry_youtrack.youtrack import RequestCoalescer
+
+
+def run_concurrently(func, count):
+    results, errors = [], []
+
+    def target():
+        try:
+            results.append(func())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+@pytest.fixture
+def coalescer():
+    return RequestCoalescer()
+
+
+def test_concurrent_calls_share_one_request(coalescer):
+    calls = []
+
+    def request():
+        calls.append(1)
+        time.sleep(0.2)
+        return ['myproject']
+
+    results, errors = run_concurrently(
+        lambda: coalescer.call('projects', request), 5)
+    assert calls == [1]
+    assert results == [['myproject']] * 5
+    assert (coalescer.executed, coalescer.coalesced) == (1, 4)
+    # every caller gets its own copy
+    assert len(set(id(result) for result in results)) == 5
+
+
+def test_error_is_raised_in_every_caller(coalescer):
+    def request():
+        time.sleep(0.2)
+        raise ValueError('Unavailable')
+
+    results, errors = run_concurrently(
+        lambda: coalescer.call('projects', request), 3)
+    assert results == []
+    assert [str(e) for e in errors] == ['Unavailable'] * 3
+
+
+def test_sequential_calls_are_not_coalesced(coalescer):
+    assert coalescer.call('projects', lambda: 1) == 1
+    assert coalescer.call('projects', lambda: 2) == 2
+    assert (coalescer.executed, coalescer.coalesced) == (2, 0)
@@ -0,0 +1,65 @@
+import threading
+
+import pytest
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from sentry_youtrack.youtrack import YouTrackClient, conditional_cache
+
+
+PROJECTS = (b'<?xml version="1.0" encoding="UTF-8"?><projects>'
+            b'<project shortName="myproject" name="My project"/></projects>')
+ETAG = '"projects-1"'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+
+    requests = []
+
+    def do_GET(self):
+        StubHandler.requests.append(self.headers.get('If-None-Match'))
+        if self.headers.get('If-None-Match') == ETAG:
+            self.send_response(304)
+            self.send_header('ETag', ETAG)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/xml')
+        self.send_header('Content-Length', str(len(PROJECTS)))
+        self.send_header('ETag', ETAG)
+        self.end_headers()
+        self.wfile.write(PROJECTS)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.yield_fixture
+def server_url():
+    server = HTTPServer(('127.0.0.1', 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    StubHandler.requests = []
+    conditional_cache.clear()
+    yield 'http://127.0.0.1:%s' % server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def test_reuse_result_when_not_modified(server_url):
+    client = YouTrackClient(server_url, api_key='abcd1234')
+    expected = [{'id': 'myproject', 'name': 'My project'}]
+    assert list(client.get_projects()) == expected
+    assert list(client.get_projects()) == expected
+    assert StubHandler.requests == [None, ETAG]
+    assert (conditional_cache.hits, conditional_cache.misses) == (1, 1)
+
+
+def test_validators_are_kept_per_user(server_url):
+    list(YouTrackClient(server_url, api_key='abcd1234').get_projects())
+    list(YouTrackClient(server_url, api_key='efgh5678').get_projects())
+    assert StubHandler.requests == [None, None]
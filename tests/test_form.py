@@ -1,7 +1,13 @@
 from datetime import date
 
+import pytest
 from django import forms
-from sentry_youtrack.forms import YouTrackProjectForm
+
+from sentry_youtrack import forms as forms_module
+from sentry_youtrack.forms import (NewIssueForm, RemoteChoiceField,
+                                   YouTrackConfigurationForm,
+                                   YouTrackProjectForm, get_field_key,
+                                   get_form_schema)
 
 
 YOUTRACK_FIELDS = [
@@ -61,3 +67,143 @@ def test_project_fields_values():
     form = YouTrackProjectForm(YOUTRACK_FIELDS, data)
     assert form.get_project_field_values() == expected_result
 
+
+
+class FakeClient(object):
+
+    instances = []
+
+    def __init__(self, url, username=None, password=None, **kwargs):
+        self.url = url
+        self.token_key = (url, username, password)
+        self.api_key = 'abcd1234'
+        self.calls = []
+        FakeClient.instances.append(self)
+
+    def get_user(self, username):
+        self.calls.append('get_user')
+        return {'login': username}
+
+    def get_projects(self):
+        self.calls.append('get_projects')
+        return [{'id': 'myproject', 'name': 'My project'}]
+
+    def get_project_fields_list(self, project_id):
+        self.calls.append('get_project_fields_list')
+        return [{'name': 'Priority', 'url': ''}]
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    monkeypatch.setattr(forms_module, 'YouTrackClient', FakeClient)
+    forms_module.project_cache.clear()
+    forms_module.validated_users.clear()
+    FakeClient.instances = []
+
+
+def test_configuration_form_validates_credentials_once(fake_client):
+    initial = {'url': 'https://youtrack.myjetbrains.com', 'username': 'root',
+               'password': 'admin', 'project': 'myproject'}
+    data = dict(initial, default_tags='sentry', ignore_fields=['Priority'])
+    form = YouTrackConfigurationForm(data, initial=initial)
+    assert form.is_valid()
+    assert len(FakeClient.instances) == 1
+    assert sorted(FakeClient.instances[0].calls) == [
+        'get_project_fields_list', 'get_projects', 'get_user']
+
+    # the next render uses the cached projects and validation
+    YouTrackConfigurationForm(None, initial=initial)
+    assert FakeClient.instances[1].calls == ['get_project_fields_list']
+
+
+def test_configuration_form_validates_changed_credentials(fake_client):
+    initial = {'url': 'https://youtrack.myjetbrains.com', 'username': 'root',
+               'password': 'admin', 'project': 'myproject'}
+    data = dict(initial, username='admin')
+    assert YouTrackConfigurationForm(data, initial=initial).is_valid()
+    assert len(FakeClient.instances) == 2
+    assert FakeClient.instances[1].calls == ['get_user']
+
+
+def test_schema_is_compiled_once():
+    fields = [dict(field) for field in YOUTRACK_FIELDS]
+    assert (YouTrackProjectForm.get_schema(fields) is
+            YouTrackProjectForm.get_schema(YOUTRACK_FIELDS))
+    form1 = YouTrackProjectForm(YOUTRACK_FIELDS)
+    form2 = YouTrackProjectForm(YOUTRACK_FIELDS)
+    assert form1.fields['field_5'] is not form2.fields['field_5']
+
+
+class CollidingValue(str):
+
+    def __hash__(self):
+        return 1
+
+
+def test_schemas_with_the_same_hash():
+    fields1 = [{'type': 'enum[1]', 'name': 'f1',
+                'values': [CollidingValue('a')]}]
+    fields2 = [{'type': 'enum[1]', 'name': 'f1',
+                'values': [CollidingValue('b')]}]
+    schema1 = YouTrackProjectForm.get_schema(fields1)
+    schema2 = YouTrackProjectForm.get_schema(fields2)
+    assert schema1 is not schema2
+    assert list(schema2[0][3].choices)[-1][0] == 'b'
+
+
+def test_project_field_names_are_per_form():
+    form = YouTrackProjectForm(YOUTRACK_FIELDS[:2])
+    YouTrackProjectForm(YOUTRACK_FIELDS)
+    assert form.project_field_names == {'field_1': 'f1', 'field_2': 'f2'}
+
+
+def test_initial_default_fields():
+    default_fields = {get_field_key('f5'): 't2', get_field_key('f7'): 't7,t9'}
+    initial = {'default_fields': default_fields}
+    form = YouTrackProjectForm(YOUTRACK_FIELDS, initial=initial)
+    assert form['field_5'].value() == 't2'
+    assert form['field_7'].value() == ['t7', 't9']
+    assert YouTrackProjectForm(YOUTRACK_FIELDS)['field_5'].value() is None
+    assert initial == {'default_fields': default_fields}
+
+
+def test_remote_choice_fields(monkeypatch):
+    monkeypatch.setattr(forms_module, 'CHOICES_LIMIT', 2)
+    fields = [
+        {'type': 'user[1]', 'name': 'Assignee', 'values': ['u1', 'u2', 'u3']},
+        {'type': 'version[*]', 'name': 'Fix versions',
+         'values': ['v1', 'v2', 'v3']},
+        {'type': 'enum[1]', 'name': 'Priority', 'values': ['p1', 'p2']}]
+    data = {'field_1': 'u2', 'field_2': 'v1,v3', 'field_3': 'p1'}
+    form = YouTrackProjectForm(fields, data)
+    assert [type(field) for field in form.fields.values()] == [
+        RemoteChoiceField, RemoteChoiceField, forms.ChoiceField]
+    assert form.get_project_field_values() == {
+        'Assignee': 'u2', 'Fix versions': ['v1', 'v3'], 'Priority': 'p1'}
+
+    form = YouTrackProjectForm(fields, dict(data, field_2='v1,v4'))
+    assert not form.is_valid()
+    assert list(form.errors) == ['field_2']
+
+
+def test_form_schema(monkeypatch):
+    monkeypatch.setattr(forms_module, 'CHOICES_LIMIT', 2)
+    fields = [
+        {'type': 'user[1]', 'name': 'Assignee', 'values': ['u1', 'u2', 'u3']},
+        {'type': 'version[*]', 'name': 'Fix versions', 'values': ['v1', 'v2']}]
+    form = NewIssueForm(fields, initial={'title': 'Error'})
+    schema = dict((field['name'], field) for field in get_form_schema(form))
+
+    assert [field['name'] for field in get_form_schema(form)] == [
+        'title', 'description', 'tags', 'field_1', 'field_2']
+    assert schema['title']['widget'] == 'text'
+    assert schema['title']['value'] == 'Error'
+    assert schema['title']['required']
+    assert schema['description']['widget'] == 'textarea'
+    assert schema['tags']['help_text'] == 'Comma-separated list of tags'
+    assert schema['field_1']['widget'] == 'remote'
+    assert schema['field_1']['attrs']['data-field'] == 'Assignee'
+    assert schema['field_2']['widget'] == 'select'
+    assert schema['field_2']['multiple']
+    assert [value for value, label in schema['field_2']['choices']] == [
+        'v1', 'v2']
@@ -0,0 +1,91 @@
+import pytest
+from sentry.utils.cache import cache
+
+from sentry_youtrack import index as index_module
+from sentry_youtrack.index import IssueIndex
+from sentry_youtrack.youtrack import IssueIterator
+
+
+def issue(number, summary, state='Open'):
+    return {'id': 'myproject-%d' % number, 'summary': summary, 'state': state}
+
+
+class FakeClient(object):
+
+    def __init__(self, issues):
+        self.issues = issues
+        self.calls = []
+
+    def get_project_issues(self, project_id, query=None, offset=0, limit=15,
+                           updated_after=None):
+        self.calls.append((offset, updated_after))
+        return self.issues[offset:offset + limit]
+
+    def iter_project_issues(self, project_id, **kwargs):
+        return IssueIterator(self, project_id, **kwargs)
+
+
+@pytest.fixture
+def index():
+    cache.clear()
+    index = IssueIndex('https://youtrack.myjetbrains.com', 'myproject')
+    index.PAGE_SIZE = 2
+    index.CHUNK_SIZE = 2
+    index.sync(FakeClient([
+        issue(1, 'Crash in worker'),
+        issue(2, 'Slow search'),
+        issue(12, 'Worker timeout', 'Fixed')]))
+    return index
+
+
+def test_sync(index):
+    data = IssueIndex('https://youtrack.myjetbrains.com', 'myproject').load()
+    assert [i['id'] for i in data['issues']] == [
+        'myproject-12', 'myproject-2', 'myproject-1']
+
+
+def test_incremental_sync(index):
+    client = FakeClient([issue(2, 'Slow search', 'Fixed'), issue(13, 'New')])
+    index.sync(client)
+    assert client.calls[0][1] is not None
+    assert index.search() == ([
+        issue(13, 'New'),
+        issue(12, 'Worker timeout', 'Fixed'),
+        issue(2, 'Slow search', 'Fixed'),
+        issue(1, 'Crash in worker')], False)
+
+
+def test_search(index):
+    assert index.search('1') == ([
+        issue(12, 'Worker timeout', 'Fixed'),
+        issue(1, 'Crash in worker')], False)
+    assert index.search('WORKER') == ([
+        issue(12, 'Worker timeout', 'Fixed'),
+        issue(1, 'Crash in worker')], False)
+    assert index.search('myproject-2') == ([issue(2, 'Slow search')], False)
+
+
+def test_search_pagination(index):
+    assert index.search(offset=0, limit=2) == ([
+        issue(12, 'Worker timeout', 'Fixed'),
+        issue(2, 'Slow search')], True)
+    assert index.search(offset=2, limit=2) == ([
+        issue(1, 'Crash in worker')], False)
+
+
+def test_missing_chunk(index):
+    cache.delete('%s:%s:1' % (index.key, int(index.data['synced_at'] * 1000)))
+    assert index.load() is None
+
+
+def test_sync_newest_issues(monkeypatch):
+    cache.clear()
+    monkeypatch.setattr(index_module, 'INDEX_SIZE', 2)
+    index = IssueIndex('https://youtrack.myjetbrains.com', 'myproject')
+    client = FakeClient([issue(number, 'Issue') for number in range(5, 0, -1)])
+    index.sync(client)
+    assert [i['id'] for i in index.search()[0]] == [
+        'myproject-5', 'myproject-4']
+    # only the next page may have been prefetched
+    assert client.calls[0] == (0, None)
+    assert len(client.calls) <= 2
@@ -0,0 +1,175 @@
+import pytest
+import requests
+from sentry.utils.cache import cache
+
+from sentry_youtrack import outbox as outbox_module
+from sentry_youtrack import tasks as tasks_module
+from sentry_youtrack.outbox import (FAILED, OUTBOX_MAX_ATTEMPTS, PENDING,
+                                    IssueOutbox)
+from sentry_youtrack.youtrack import YouTrackCommandError
+
+
+class MemoryOutbox(IssueOutbox):
+
+    def __init__(self):
+        super(MemoryOutbox, self).__init__(None, 'youtrack')
+        self.saved = []
+
+    def save(self):
+        self.saved.append(dict(self.record))
+
+
+class FakeClient(object):
+
+    def __init__(self, fail_create=False, fail_commands=False, issues=()):
+        self.fail_create = fail_create
+        self.fail_commands = fail_commands
+        self.issues = list(issues)
+        self.created = []
+        self.commands = []
+
+    def create_issue(self, data):
+        if self.fail_create:
+            raise requests.ConnectionError('Connection refused')
+        self.created.append(data)
+        return 'myproject-%d' % len(self.created)
+
+    def execute_commands(self, issue, commands):
+        if self.fail_commands:
+            raise YouTrackCommandError(issue, [(commands[0], 'Unknown')])
+        self.commands.append((issue, commands))
+
+    def get_project_issues(self, project_id, query=None, offset=0, limit=15,
+                           updated_after=None):
+        return [{'id': issue} for issue in self.issues][:limit]
+
+
+@pytest.fixture
+def outbox():
+    outbox = MemoryOutbox()
+    outbox.create({'project': 'myproject', 'summary': 'Crash',
+                   'description': 'Details'}, ['Priority Critical'])
+    return outbox
+
+
+def test_create(outbox):
+    record = outbox.record
+    assert record['status'] == PENDING
+    assert record['issue']['description'] == 'Details\n\n%s' % record['key']
+
+
+def test_process(outbox):
+    client = FakeClient()
+    assert outbox.process(client) == 'myproject-1'
+    assert client.commands == [('myproject-1', ['Priority Critical'])]
+    # the issue id is saved before running the commands
+    assert outbox.saved[-2]['issue_id'] == 'myproject-1'
+    assert outbox.saved[-2]['commands'] == ['Priority Critical']
+
+
+def test_retry_does_not_create_issue_again(outbox):
+    outbox.process(FakeClient(fail_commands=True))
+    assert outbox.record['warning']
+    client = FakeClient()
+    assert outbox.process(client) == 'myproject-1'
+    assert client.created == client.commands == []
+
+
+def test_find_issue_created_by_lost_attempt(outbox):
+    with pytest.raises(requests.ConnectionError):
+        outbox.process(FakeClient(fail_create=True))
+    client = FakeClient(issues=['myproject-7'])
+    assert outbox.process(client) == 'myproject-7'
+    assert client.created == []
+
+
+def test_retry_until_failed(outbox):
+    for attempt in range(OUTBOX_MAX_ATTEMPTS - 1):
+        assert outbox.retry(Exception('Timeout')) > 0
+    assert outbox.retry(Exception('Timeout')) is None
+    assert outbox.record['status'] == FAILED
+    assert outbox.record['error'] == 'Timeout'
+    outbox.restart()
+    assert outbox.is_pending()
+
+
+class CacheNotPopulated(Exception):
+    pass
+
+
+class FakeValues(object):
+
+    def __init__(self, values):
+        self.values = values
+
+    def values_list(self, *fields, **kwargs):
+        return self
+
+    def first(self):
+        return self.values[0] if self.values else None
+
+
+class FakeGroupMetaManager(object):
+    """Like the manager of ``GroupMeta`` in a worker, whose cache hasn't
+    been populated."""
+
+    def __init__(self):
+        self.values = {}
+
+    def get_value(self, group, key, default=None):
+        raise CacheNotPopulated()
+
+    def filter(self, group, key):
+        value = self.values.get((group.id, key))
+        return FakeValues([] if value is None else [value])
+
+    def set_value(self, group, key, value):
+        self.values[(group.id, key)] = value
+
+    def unset_value(self, group, key):
+        self.values.pop((group.id, key), None)
+
+
+class FakeGroup(object):
+
+    id = 1
+    project = None
+
+
+class FakeGroupManager(object):
+
+    def get_from_cache(self, id):
+        return FakeGroup()
+
+
+class FakePlugin(object):
+
+    def __init__(self):
+        self.client = FakeClient()
+        self.linked = []
+
+    def get_outbox(self, group):
+        return IssueOutbox(group, 'youtrack')
+
+    def get_youtrack_client(self, project):
+        return self.client
+
+    def link_outbox_issue(self, group, outbox, issue_id):
+        self.linked.append(issue_id)
+        outbox.delete()
+
+
+def test_create_outbox_issue_task(monkeypatch):
+    cache.clear()
+    manager = FakeGroupMetaManager()
+    plugin = FakePlugin()
+    monkeypatch.setattr(outbox_module.GroupMeta, 'objects', manager)
+    monkeypatch.setattr(tasks_module.Group, 'objects', FakeGroupManager())
+    monkeypatch.setattr(tasks_module, 'get_plugin', lambda: plugin)
+    IssueOutbox(FakeGroup(), 'youtrack').create(
+        {'project': 'myproject', 'summary': 'Crash'}, ['Priority Critical'])
+
+    tasks_module.create_outbox_issue(group_id=1)
+    assert plugin.linked == ['myproject-1']
+    assert plugin.client.commands == [('myproject-1', ['Priority Critical'])]
+    assert manager.values == {}
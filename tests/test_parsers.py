@@ -0,0 +1,65 @@
+# -*- encoding: utf-8 -*-
+import pytest
+
+from sentry_youtrack.parsers import IterParser, SoupParser
+
+
+XML_HEADER = b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+
+ISSUES = XML_HEADER + u"""<issues><issue id="myproject-1"><field
+name="summary"><value>Zażółć gęślą jaźń</value></field><field
+name="State"><value>Open</value></field></issue><issue
+id="myproject-2"><field name="summary"><value>Crash</value></field><field
+name="State"><value>Fixed</value></field></issue></issues>""".encode('utf-8')
+
+USER_BUNDLE = XML_HEADER + b"""<userBundle name="Assignees"><user
+login="root"/><userGroup name="developers"/><user login="admin"/></userBundle>"""
+
+PROJECT_FIELD = XML_HEADER + b"""<projectCustomField name="Priority"
+type="enum[1]" emptyText="No Priority" canBeEmpty="false"><param
+name="bundle" value="Priorities"/></projectCustomField>"""
+
+
+@pytest.fixture(params=[SoupParser, IterParser])
+def parser(request):
+    return request.param()
+
+
+def test_get_issues(parser):
+    assert list(parser.get_issues(ISSUES)) == [
+        {'id': 'myproject-1', 'state': 'Open',
+         'summary': u'Zażółć gęślą jaźń'},
+        {'id': 'myproject-2', 'state': 'Fixed', 'summary': 'Crash'}]
+
+
+def test_get_user_bundle(parser):
+    assert parser.get_user_bundle(USER_BUNDLE) == (
+        ['root', 'admin'], ['developers'])
+
+
+def test_get_project_field(parser):
+    assert parser.get_project_field(PROJECT_FIELD) == {
+        'name': 'Priority',
+        'type': 'enum[1]',
+        'empty_text': 'No Priority',
+        'param': 'Priorities'}
+
+
+def test_get_bundle_values(parser):
+    content = XML_HEADER + (b'<versions name="Versions">' +
+                            b''.join(b'<version>%d.0</version>' % i
+                                     for i in range(100)) +
+                            b'</versions>')
+    values = parser.get_bundle_values(content, 'versions')
+    assert values == ['%d.0' % i for i in range(100)]
+
+
+def test_get_error(parser):
+    assert parser.get_error(XML_HEADER + b'<error>Not found</error>') == (
+        'Not found')
+    assert parser.get_error(PROJECT_FIELD) is None
+
+
+def test_is_login(parser):
+    assert parser.is_login(b'<login>ok</login>')
+    assert not parser.is_login(b'<html><body>Not YouTrack</body></html>')
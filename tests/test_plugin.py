@@ -0,0 +1,356 @@
+import json
+
+import pytest
+from requests.exceptions import ConnectionError, HTTPError
+from sentry.utils.cache import cache
+
+from sentry_youtrack import plugin as plugin_module
+from sentry_youtrack.forms import get_field_key
+from sentry_youtrack.plugin import YouTrackPlugin
+
+
+PROJECT_FIELDS = [
+    {'name': 'Priority', 'type': 'enum[1]', 'values': ['Critical', 'Normal']},
+    {'name': 'Fix versions', 'type': 'version[*]', 'values': ['1.0', '2.0']},
+    {'name': 'Estimation', 'type': 'integer', 'values': None}]
+
+
+class FakeManager(object):
+
+    def __init__(self):
+        self.created = []
+
+    def bind_nodes(self, objects, *args):
+        pass
+
+    def bulk_create(self, objects):
+        self.created.extend(objects)
+
+
+class FakeModel(object):
+
+    CREATE_ISSUE = 'create_issue'
+    objects = FakeManager()
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class FakeGroup(object):
+
+    def __init__(self, group_id, project_id=1):
+        self.id = group_id
+        self.project_id = project_id
+        self.project = 'project'
+
+    def get_latest_event(self):
+        return None
+
+    def error(self):
+        return 'Error %d' % self.id
+
+
+class FakeClient(object):
+
+    def __init__(self):
+        self.commands = []
+
+    def create_issues(self, issues, commands=(), callback=None):
+        self.commands.append(commands)
+        return [('myproject-%d' % number, None)
+                for number in range(1, len(issues) + 1)]
+
+
+class FakeStatesClient(object):
+
+    def get_issues(self, project_id, issue_ids, batch_size=50):
+        return [{'id': issue_id, 'state': 'Fixed', 'summary': None}
+                for issue_id in issue_ids]
+
+
+@pytest.fixture
+def plugin(monkeypatch):
+    options = {
+        'url': 'https://youtrack.myjetbrains.com',
+        'project': 'myproject',
+        'default_tags': 'sentry',
+        'default_fields': {
+            get_field_key('Priority'): 'Critical',
+            get_field_key('Fix versions'): '1.0,2.0',
+            get_field_key('Removed field'): 'value'}}
+    plugin = YouTrackPlugin()
+    plugin.client = FakeClient()
+    monkeypatch.setattr(plugin, 'get_option',
+                        lambda key, project: options.get(key))
+    monkeypatch.setattr(plugin, 'get_project_fields',
+                        lambda project: PROJECT_FIELDS)
+    monkeypatch.setattr(plugin, 'get_youtrack_client',
+                        lambda project: plugin.client)
+    monkeypatch.setattr(plugin, 'link_issues', lambda groups, issue_ids: None)
+    monkeypatch.setattr(FakeModel, 'objects', FakeManager())
+    monkeypatch.setattr(plugin_module, 'Activity', FakeModel)
+    monkeypatch.setattr(plugin_module, 'Event', FakeModel)
+    return plugin
+
+
+def test_get_default_field_values(plugin):
+    assert plugin.get_default_field_values('project') == {
+        'Priority': 'Critical', 'Fix versions': ['1.0', '2.0']}
+
+
+def test_create_issues_with_default_fields(plugin):
+    issue_ids, errors = plugin.create_issues(
+        [FakeGroup(1), FakeGroup(2)], user='admin')
+    assert issue_ids == {1: 'myproject-1', 2: 'myproject-2'}
+    assert errors == {}
+    assert sorted(plugin.client.commands[0]) == [
+        'Fix versions 1.0 Fix versions 2.0', 'Priority Critical',
+        'add tag sentry']
+    assert [activity.user for activity in FakeModel.objects.created] == [
+        'admin', 'admin']
+
+
+def test_create_issues_in_more_projects(plugin):
+    with pytest.raises(ValueError):
+        plugin.create_issues([FakeGroup(1), FakeGroup(2, project_id=2)])
+    assert plugin.client.commands == []
+
+
+class FakeGroupMetaManager(object):
+
+    def __init__(self, values):
+        self.values = values
+
+    def get_value(self, group, key, default=None):
+        return self.values.get((group.id, key), default)
+
+    def filter(self, **kwargs):
+        return self
+
+    def order_by(self, *fields):
+        return self
+
+    def values_list(self, *fields, **kwargs):
+        return sorted(self.values.values())
+
+
+class FakeTask(object):
+
+    def __init__(self):
+        self.calls = []
+
+    def delay(self, **kwargs):
+        self.calls.append(kwargs)
+
+
+class FakeProject(object):
+
+    id = 1
+
+
+@pytest.fixture
+def linked_group(plugin, monkeypatch):
+    group = FakeGroup(1)
+    group.project = FakeProject()
+    monkeypatch.setattr(plugin_module.GroupMeta, 'objects',
+                        FakeGroupMetaManager({
+                            (1, 'youtrack:tid'): 'myproject-1'}))
+    return group
+
+
+def test_tags_schedule_fetching_states(plugin, linked_group, monkeypatch):
+    cache.clear()
+    task = FakeTask()
+    monkeypatch.setattr(plugin_module, 'fetch_issue_states', task)
+    assert plugin.tags(None, linked_group, []) == [
+        '<a href="https://youtrack.myjetbrains.com/issue/myproject-1">'
+        '#myproject-1</a>']
+    plugin.tags(None, linked_group, [])
+    assert task.calls == [{'project_id': 1, 'issue_ids': ['myproject-1']}]
+
+    plugin.get_issue_states_cache(linked_group.project).fetch(
+        FakeStatesClient(), ['myproject-1'])
+    assert plugin.tags(None, linked_group, []) == [
+        '<a href="https://youtrack.myjetbrains.com/issue/myproject-1">'
+        '#myproject-1 (Fixed)</a>']
+
+
+def test_fetch_issue_states_of_older_issues(plugin, linked_group):
+    cache.clear()
+    plugin.client = FakeStatesClient()
+    # myproject-0 was linked before the most recently linked issues
+    states = plugin.fetch_issue_states(linked_group.project, ['myproject-0'])
+    assert states == {'myproject-0': 'Fixed', 'myproject-1': 'Fixed'}
+
+
+def test_tags_without_states(plugin, linked_group, monkeypatch):
+    def get_issue_states(project, issue_ids):
+        raise HTTPError('403 Client Error: Forbidden')
+
+    monkeypatch.setattr(plugin, 'get_issue_states', get_issue_states)
+    assert plugin.tags(None, linked_group, []) == [
+        '<a href="https://youtrack.myjetbrains.com/issue/myproject-1">'
+        '#myproject-1</a>']
+
+
+class FakeRequest(object):
+
+    def __init__(self, **data):
+        self.POST = dict(data, page_limit='15')
+
+
+class FakeIssueIndex(object):
+
+    def __init__(self, issues):
+        self.issues = issues
+
+    def load(self):
+        return {'issues': self.issues}
+
+    def is_stale(self):
+        return False
+
+    def search(self, query=None, offset=0, limit=15):
+        issues = [issue for issue in self.issues
+                  if not query or query in issue['summary']]
+        return issues[offset:offset + limit], len(issues) > offset + limit
+
+
+def test_project_issues_view_falls_back_to_youtrack(plugin, monkeypatch):
+    indexed = [{'id': 'myproject-2', 'summary': 'Slow search'}]
+    older = [{'id': 'myproject-1', 'summary': 'Crash in worker'}]
+    queries = []
+
+    def get_project_issues(project_id, query=None, offset=0, limit=15):
+        queries.append(query)
+        return older
+
+    plugin.client.get_project_issues = get_project_issues
+    monkeypatch.setattr(plugin, 'get_issue_index',
+                        lambda project: FakeIssueIndex(indexed))
+    group = FakeGroup(1)
+
+    response = plugin.project_issues_view(FakeRequest(q='search', page='1'), group)
+    assert json.loads(response.content)['issues'] == indexed
+    response = plugin.project_issues_view(FakeRequest(q='worker', page='1'), group)
+    assert json.loads(response.content)['issues'] == older
+    assert queries == ['worker']
+
+
+class FakeUser(object):
+
+    id = 1
+
+
+class FakeOutbox(object):
+
+    def __init__(self):
+        self.created = []
+
+    def create(self, issue, commands, user_id):
+        self.created.append((issue, commands, user_id))
+
+
+def test_enqueue_issue_when_youtrack_is_unavailable(plugin, monkeypatch):
+    def get_project_fields(project):
+        raise ConnectionError('Connection refused')
+
+    outbox = FakeOutbox()
+    monkeypatch.setattr(plugin, 'get_project_fields', get_project_fields)
+    monkeypatch.setattr(plugin, 'get_initial_form_data',
+                        lambda request, group, event: {})
+    monkeypatch.setattr(plugin, 'get_outbox', lambda group: outbox)
+    monkeypatch.setattr(plugin_module, 'create_outbox_issue', FakeTask())
+    monkeypatch.setattr(plugin_module.messages, 'add_message',
+                        lambda *args: None)
+    request = FakeRequest(title='Error', description='Traceback',
+                          tags='sentry')
+    request.user = FakeUser()
+
+    assert plugin.enqueue_issue(request, FakeGroup(1))
+    assert outbox.created == [(
+        {'project': 'myproject', 'summary': 'Error',
+         'description': 'Traceback'}, [u'add tag sentry'], 1)]
+
+
+def schema(name, field_type, bundle=None):
+    if bundle is not None:
+        bundle = {'name': 'bundle', 'value': bundle, 'bundle': 'enumeration'}
+    return {'name': name, 'type': field_type, 'empty_text': None,
+            'bundle': bundle}
+
+
+class FakeFieldsClient(object):
+
+    def __init__(self, schemas, fail=False):
+        self.schemas = schemas
+        self.fail = fail
+        self.calls = []
+
+    def get_project_field_schemas(self, project_id, ignore_fields=None):
+        return iter(self.schemas)
+
+    def get_bundles_values(self, bundles):
+        self.calls.append([bundle['value'] for bundle in bundles])
+        if self.fail:
+            raise ConnectionError('Connection refused')
+        return [['%s value' % bundle['value']] for bundle in bundles]
+
+
+def test_get_project_fields_with_bundles(plugin):
+    cache.clear()
+    priorities = schema('Priority', 'enum[1]', 'Priorities')
+    plugin.client = FakeFieldsClient([
+        priorities, schema('Estimation', 'integer')])
+    fields = YouTrackPlugin.get_project_fields(plugin, 'project')
+    assert [(field['name'], field['values']) for field in fields] == [
+        ('Priority', ['Priorities value']), ('Estimation', None)]
+    assert plugin.client.calls == [['Priorities']]
+
+    types = schema('Type', 'enum[1]', 'Types')
+    assert plugin.get_bundle_values(
+        'project', [types['bundle'], priorities['bundle']]) == [
+        ['Types value'], ['Priorities value']]
+    assert plugin.client.calls == [['Priorities'], ['Types']]
+
+    plugin.client = FakeFieldsClient([], fail=True)
+    assert plugin.get_bundle_values('project', [priorities['bundle']]) == [
+        ['Priorities value']]
+    states = schema('State', 'enum[1]', 'States')
+    with pytest.raises(ConnectionError):
+        plugin.get_bundle_values(
+            'project', [priorities['bundle'], states['bundle']])
+    assert plugin.client.calls == [['States']]
+
+
+def test_form_schema_view_revalidation(plugin, monkeypatch):
+    cache.clear()
+    plugin.client = FakeFieldsClient([
+        schema('Priority', 'enum[1]', 'Priorities')])
+    monkeypatch.setattr(plugin, 'get_project_fields',
+                        YouTrackPlugin.get_project_fields.__get__(plugin))
+    monkeypatch.setattr(plugin, 'get_initial_form_data',
+                        lambda request, group, event: {'title': 'Error'})
+    forms_built = []
+    new_issue_form = plugin.new_issue_form
+    monkeypatch.setattr(plugin, 'new_issue_form', lambda **kwargs: (
+        forms_built.append(1) or new_issue_form(**kwargs)))
+    request = FakeRequest()
+    request.META = {}
+
+    response = plugin.form_schema_view(request, FakeGroup(1))
+    assert response.status_code == 200
+    fields = json.loads(response.content)['fields']
+    assert [field['name'] for field in fields][-1] == 'field_1'
+    etag = response['ETag']
+
+    request.META = {'HTTP_IF_NONE_MATCH': etag}
+    response = plugin.form_schema_view(request, FakeGroup(1))
+    assert response.status_code == 304
+    assert response['ETag'] == etag
+    assert len(forms_built) == 1
+
+    # the ETag needs the versions of the cached fields
+    cache.delete(plugin._get_fields_version_key(
+        'https://youtrack.myjetbrains.com', 'myproject', None))
+    assert plugin.get_form_schema_etag(FakeGroup(1), None) is None
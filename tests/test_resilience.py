@@ -0,0 +1,110 @@
+import socket
+import threading
+import time
+
+import pytest
+import requests
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from sentry_youtrack.youtrack import (CircuitBreaker, CircuitOpenError,
+                                      YouTrackClient, close_sessions)
+
+
+PROJECTS = (b'<?xml version="1.0" encoding="UTF-8"?><projects>'
+            b'<project shortName="myproject" name="My project"/></projects>')
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+
+    failures = 0
+    requests = 0
+
+    def do_GET(self):
+        FlakyHandler.requests += 1
+        if FlakyHandler.requests <= FlakyHandler.failures:
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/xml')
+        self.send_header('Content-Length', str(len(PROJECTS)))
+        self.end_headers()
+        self.wfile.write(PROJECTS)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.yield_fixture
+def server_url():
+    server = HTTPServer(('127.0.0.1', 0), FlakyHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    FlakyHandler.requests = 0
+    close_sessions()
+    yield 'http://127.0.0.1:%s' % server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def unused_url():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return 'http://127.0.0.1:%s' % port
+
+
+def test_circuit_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.1)
+    breaker.failure()
+    breaker.before_request()
+    breaker.failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+    time.sleep(0.1)
+    # a single request is let through
+    breaker.before_request()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+    breaker.success()
+    breaker.before_request()
+    assert not breaker.is_open()
+
+
+def test_retry_get(server_url):
+    FlakyHandler.failures = 2
+    client = YouTrackClient(server_url, api_key='abcd1234', retries=2,
+                            retry_backoff=0.01)
+    assert list(client.get_projects()) == [
+        {'id': 'myproject', 'name': 'My project'}]
+    assert FlakyHandler.requests == 3
+
+
+def test_retries_are_bounded(server_url):
+    FlakyHandler.failures = 5
+    client = YouTrackClient(server_url, api_key='abcd1234', retries=1,
+                            retry_backoff=0.01)
+    with pytest.raises(requests.HTTPError):
+        list(client.get_projects())
+    assert FlakyHandler.requests == 2
+
+
+def test_fail_fast_while_circuit_is_open():
+    close_sessions()
+    client = YouTrackClient(unused_url(), api_key='abcd1234',
+                            failure_threshold=2, retries=5,
+                            retry_backoff=0.01)
+    with pytest.raises(requests.ConnectionError) as e:
+        list(client.get_projects())
+    assert not isinstance(e.value, CircuitOpenError)
+    # the circuit opened after the second attempt, so it wasn't retried
+    assert client.session.breaker.failures == 2
+    with pytest.raises(CircuitOpenError):
+        list(client.get_projects())
@@ -0,0 +1,46 @@
+import pytest
+from sentry.utils.cache import cache
+
+from sentry_youtrack.states import IssueStates
+
+
+class FakeClient(object):
+
+    def __init__(self, states):
+        self.states = states
+        self.calls = []
+
+    def get_issues(self, project_id, issue_ids, batch_size=50):
+        self.calls.append(sorted(issue_ids))
+        return [{'id': issue_id, 'state': self.states[issue_id],
+                 'summary': None}
+                for issue_id in issue_ids if issue_id in self.states]
+
+
+@pytest.fixture
+def issue_states():
+    cache.clear()
+    return IssueStates('https://youtrack.myjetbrains.com', 'myproject')
+
+
+def test_fetch(issue_states):
+    client = FakeClient({'myproject-1': 'Open', 'myproject-2': 'Fixed'})
+    assert issue_states.get_cached(['myproject-1']) == {}
+    assert issue_states.fetch(
+        client, ['myproject-1', 'myproject-2', 'myproject-3']) == {
+        'myproject-1': 'Open', 'myproject-2': 'Fixed', 'myproject-3': None}
+    assert issue_states.get_cached(['myproject-2', 'myproject-3']) == {
+        'myproject-2': 'Fixed', 'myproject-3': None}
+
+
+def test_schedule_fetch(issue_states):
+    assert issue_states.schedule_fetch()
+    assert not issue_states.schedule_fetch()
+
+
+def test_invalidate(issue_states):
+    client = FakeClient({'myproject-1': 'Open', 'myproject-2': 'Open'})
+    issue_states.fetch(client, ['myproject-1', 'myproject-2'])
+    issue_states.invalidate(['myproject-1'])
+    assert issue_states.get_cached(['myproject-1', 'myproject-2']) == {
+        'myproject-2': 'Open'}
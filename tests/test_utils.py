@@ -0,0 +1,130 @@
+import threading
+import time
+
+import pytest
+from sentry.utils.cache import cache
+
+from sentry_youtrack.utils import cache_this, get_cache_key
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+def test_cache_key_ignores_order():
+    assert (get_cache_key('fields', ['b', 'a'], project='p', url='u') ==
+            get_cache_key('fields', ['a', 'b'], url='u', project='p'))
+    assert get_cache_key('fields', ['a']) != get_cache_key('fields', ['b'])
+
+
+def test_cache_key_keeps_positional_order():
+    assert get_cache_key('f', 'a', 'b') != get_cache_key('f', 'b', 'a')
+
+    @cache_this(60)
+    def sub(a, b):
+        return a - b
+
+    assert sub(5, 3) == 2
+    assert sub(3, 5) == -2
+
+
+def test_cache_empty_result():
+    calls = []
+
+    @cache_this(60)
+    def fields(project):
+        calls.append(project)
+        return []
+
+    assert fields('p') == []
+    assert fields('p') == []
+    assert calls == ['p']
+
+
+def test_return_stale_result_when_refresh_fails():
+    results = [['Priority'], RuntimeError('YouTrack is down')]
+
+    @cache_this(0, stale_timeout=60)
+    def fields(project):
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    assert fields('p') == ['Priority']
+    assert fields('p') == ['Priority']
+    assert not results
+
+
+def test_compute_once_for_concurrent_misses():
+    calls = []
+
+    @cache_this(60)
+    def fields(project):
+        calls.append(project)
+        time.sleep(0.2)
+        return ['Priority']
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(fields('p')))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [['Priority']] * 5
+    assert calls == ['p']
+
+
+def test_refresh():
+    results = [['Priority'], ['Priority', 'Type']]
+
+    @cache_this(60)
+    def fields(project):
+        return results.pop(0)
+
+    assert fields.ttl('p') is None
+    assert fields('p') == ['Priority']
+    assert 59 < fields.ttl('p') <= 60
+    assert fields.refresh('p') == ['Priority', 'Type']
+    assert fields('p') == ['Priority', 'Type']
+
+
+def test_recheck_cache_after_lock(monkeypatch):
+    calls = []
+
+    @cache_this(60)
+    def fields(project):
+        calls.append(project)
+        return ['Priority']
+
+    add = cache.add
+
+    def add_after_refresh(key, value, timeout=None):
+        # another caller refreshes and releases the lock just in time
+        cache.set(get_cache_key('fields', 'p'),
+                  (time.time() + 60, ['Priority', 'Type']), 60)
+        return add(key, value, timeout)
+
+    monkeypatch.setattr(cache, 'add', add_after_refresh)
+    assert fields('p') == ['Priority', 'Type']
+    assert fields.refresh('p') == ['Priority', 'Type']
+    assert calls == []
+
+
+def test_cache_metrics(monkeypatch):
+    counts = []
+    monkeypatch.setattr(
+        'sentry_youtrack.utils.metrics.incr',
+        lambda key, amount=1, tags=None: counts.append(tags['result']))
+
+    @cache_this(0.1)
+    def fields(project):
+        return []
+
+    fields('p')
+    fields('p')
+    time.sleep(0.15)
+    fields('p')
+    assert counts == ['miss', 'hit', 'refresh']